@@ -18,18 +18,24 @@ from builtins import (  # noqa: F401
     ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
     object, oct, open, pow, range, round, str, super, zip)
 
+from .cache import SqliteCellCache  # noqa: F401
 from .client import Collection  # noqa: F401
 from .client import Spreadsheet  # noqa: F401
 from .client import Worksheet  # noqa: F401
 from .client import WorksheetView  # noqa: F401
+from .instrumentation import RequestStats  # noqa: F401
+from .instrumentation import RequestTracer  # noqa: F401
 from .util import SCOPES
 
 login = Collection.login
 
 __all__ = [
     'Collection',
+    'RequestStats',
+    'RequestTracer',
     'SCOPES',
     'Spreadsheet',
+    'SqliteCellCache',
     'Worksheet',
     'WorksheetView',
     'login',
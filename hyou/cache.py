@@ -0,0 +1,68 @@
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import json
+import sqlite3
+
+
+class SqliteCellCache(object):
+    """Persistent cell cache backed by a SQLite database.
+
+    Fetched cell values are stored together with the modification time of
+    the spreadsheet they were fetched from. A cached entry is returned only
+    when the modification time still matches, so it is safe to share a cache
+    file among processes.
+    """
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cells ('
+            'spreadsheet_key TEXT NOT NULL, '
+            'sheet_id INTEGER NOT NULL, '
+            'cell_range TEXT NOT NULL, '
+            'updated TEXT NOT NULL, '
+            'cell_values TEXT NOT NULL, '
+            'PRIMARY KEY (spreadsheet_key, sheet_id, cell_range))')
+        self._conn.commit()
+
+    def get(self, spreadsheet_key, sheet_id, cell_range, updated):
+        row = self._conn.execute(
+            'SELECT updated, cell_values FROM cells WHERE '
+            'spreadsheet_key = ? AND sheet_id = ? AND cell_range = ?',
+            (spreadsheet_key, sheet_id, _format_cell_range(cell_range))
+        ).fetchone()
+        if row is None or row[0] != updated.isoformat():
+            return None
+        return json.loads(row[1])
+
+    def put(self, spreadsheet_key, sheet_id, cell_range, updated, values):
+        self._conn.execute(
+            'INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?)',
+            (spreadsheet_key, sheet_id, _format_cell_range(cell_range),
+             updated.isoformat(), json.dumps(values)))
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+
+def _format_cell_range(cell_range):
+    return '%d:%d:%d:%d' % tuple(cell_range)
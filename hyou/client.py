@@ -18,25 +18,44 @@ from builtins import (  # noqa: F401
     ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
     object, oct, open, pow, range, round, str, super, zip)
 
+import collections
+import csv
 import datetime
+import time
+import weakref
 
 import future.utils
 import googleapiclient.discovery
+import googleapiclient.errors
 import httplib2
 
+from . import instrumentation
+from . import transport
 from . import util
 
 
 SHEETS_API_DISCOVERY_URL = (
     'https://sheets.googleapis.com/$discovery/rest?version=v4')
 
+# Fields of a spreadsheet entry fetched by Spreadsheet.load().
+_LOAD_FIELDS = (
+    'spreadsheetId,properties,sheets(properties,'
+    'data(startRow,startColumn,rowData(values(formattedValue))))')
+
 # For compatibility.
 GOOGLE_SPREADSHEET_SCOPES = util.SCOPES
 
 
 class API(object):
 
-    def __init__(self, http):
+    def __init__(self, http, cell_cache=None, observers=None,
+                 compress_threshold=None):
+        # Observers see request bodies as sent on the wire.
+        if observers:
+            http = instrumentation.InstrumentedHttp(http, observers)
+        http = transport.GzipHttp(http, compress_threshold=compress_threshold)
+        self.http = http
+        self.cell_cache = cell_cache
         self.sheets = googleapiclient.discovery.build(
             'sheets', 'v4', http=http,
             discoveryServiceUrl=SHEETS_API_DISCOVERY_URL)
@@ -45,31 +64,72 @@ class API(object):
 
 class Collection(util.LazyOrderedDictionary):
 
-    def __init__(self, api):
+    def __init__(self, api, max_spreadsheets=None, ttl=None):
         super(Collection, self).__init__(
             self._spreadsheet_enumerator,
-            self._spreadsheet_constructor)
+            self._spreadsheet_constructor,
+            max_values=max_spreadsheets,
+            ttl=ttl)
         self._api = api
 
     @classmethod
-    def login(cls, json_path=None, json_text=None):
+    def login(cls, json_path=None, json_text=None, cell_cache=None,
+              max_spreadsheets=None, ttl=None, observers=None,
+              compress_threshold=None):
         if json_text is None:
             with open(json_path, 'r') as f:
                 json_text = f.read()
         credentials = util.parse_credentials(json_text)
         http = credentials.authorize(httplib2.Http())
-        return cls(API(http))
-
-    def create_spreadsheet(self, title, rows=1000, cols=26):
+        return cls(
+            API(http, cell_cache=cell_cache, observers=observers,
+                compress_threshold=compress_threshold),
+            max_spreadsheets=max_spreadsheets, ttl=ttl)
+
+    def create_spreadsheet(self, title, rows=1000, cols=26, data=None,
+                           worksheets=None):
+        if worksheets is None:
+            worksheets = [(None, rows, cols, data)]
+        sheets = []
+        for worksheet in worksheets:
+            worksheet_title, worksheet_rows, worksheet_cols = worksheet[:3]
+            worksheet_data = worksheet[3] if len(worksheet) > 3 else None
+            properties = {
+                'gridProperties': {
+                    'rowCount': worksheet_rows,
+                    'columnCount': worksheet_cols,
+                },
+            }
+            if worksheet_title is not None:
+                properties['title'] = worksheet_title
+            sheet = {'properties': properties}
+            if worksheet_data:
+                sheet['data'] = [{
+                    'startRow': 0,
+                    'startColumn': 0,
+                    'rowData': [
+                        {
+                            'values': [
+                                {'userEnteredValue':
+                                 util.make_extended_value(value)}
+                                for value in row
+                            ],
+                        }
+                        for row in worksheet_data
+                    ],
+                }]
+            sheets.append(sheet)
         body = {
-            'title': title,
-            'mimeType': 'application/vnd.google-apps.spreadsheet',
+            'properties': {
+                'title': title,
+            },
+            'sheets': sheets,
         }
-        response = self._api.drive.files().insert(body=body).execute()
-        key = response['id']
-        self.refresh()
-        spreadsheet = self[key]
-        spreadsheet[0].set_size(rows, cols)
+        entry = self._api.sheets.spreadsheets().create(body=body).execute()
+        for sheet_entry in entry['sheets']:
+            sheet_entry.pop('data', None)
+        spreadsheet = Spreadsheet(self._api, entry)
+        self._set_value(spreadsheet.key, spreadsheet)
         return spreadsheet
 
     def _spreadsheet_enumerator(self):
@@ -95,15 +155,67 @@ class Spreadsheet(util.LazyOrderedDictionary):
         self._api = api
         self._entry = entry
         self._updated = None
-
-    def refresh(self, entry=None):
+        self._refreshed_at = None
+
+    def refresh(self, entry=None, if_modified=False):
+        updated = None
+        if if_modified:
+            updated = self._fetch_updated()
+            if updated == self._refreshed_at:
+                return False
         if entry is not None:
             self._entry = entry
         else:
             self._entry = self._api.sheets.spreadsheets().get(
                 spreadsheetId=self.key, includeGridData=False).execute()
-        self._updated = None
+        self._updated = updated
+        self._refreshed_at = updated
         super(Spreadsheet, self).refresh()
+        return True
+
+    def load(self, with_data=True, ranges=None):
+        """Refreshes the spreadsheet and loads cells in one request.
+
+        |ranges| is a list of ranges in A1 notation, e.g. "Sheet1!A1:C10" or
+        "Sheet1!A:C", or worksheet titles. All cells are loaded if it is
+        omitted.
+        """
+        if not with_data:
+            self.refresh()
+            return
+        # Parse ranges before the request so that bad ones fail early.
+        ranges = list(ranges or [])
+        requested_ranges = collections.defaultdict(list)
+        for range_str in ranges:
+            title, cell_range = util.parse_worksheet_range_a1_notation(
+                range_str)
+            requested_ranges[title].append(cell_range)
+        params = {}
+        if ranges:
+            params['ranges'] = [
+                future.utils.text_to_native_str(range_str, encoding='utf-8')
+                for range_str in ranges]
+        entry = self._api.sheets.spreadsheets().get(
+            spreadsheetId=self.key, includeGridData=True,
+            fields=_LOAD_FIELDS, **params).execute()
+        sheet_data = [
+            (sheet_entry['properties']['title'], sheet_entry.pop('data', []))
+            for sheet_entry in entry['sheets']]
+        self.refresh(entry)
+        # Grid data of a worksheet are in the order of requested ranges.
+        for title, grid_data_list in sheet_data:
+            worksheet = self[title]
+            cell_ranges = requested_ranges[title] if ranges else [None]
+            for cell_range, grid_data in zip(cell_ranges, grid_data_list):
+                if cell_range is None:
+                    cell_range = (0, None, 0, None)
+                start_row, end_row, start_col, end_col = cell_range
+                if end_row is None:
+                    end_row = worksheet.rows
+                if end_col is None:
+                    end_col = worksheet.cols
+                worksheet._cell_store.load_grid_data(
+                    grid_data, (start_row, end_row, start_col, end_col))
 
     def add_worksheet(self, title, rows=1000, cols=26):
         new_entry = self._make_single_batch_request(
@@ -127,6 +239,35 @@ class Spreadsheet(util.LazyOrderedDictionary):
             {'sheetId': worksheet.key})
         self.refresh(new_entry)
 
+    def clear_ranges(self, views):
+        """Clears values of cells in views with one request."""
+        views = list(views)
+        range_strs = []
+        for view in views:
+            worksheet = view._worksheet
+            if worksheet._spreadsheet.key != self.key:
+                raise ValueError('Cannot clear cells of another spreadsheet')
+            # Auto-resizing views may extend beyond the grid.
+            cell_range = util.intersect_range(
+                (view.start_row, view.end_row, view.start_col, view.end_col),
+                (0, worksheet.rows, 0, worksheet.cols))
+            if cell_range:
+                range_strs.append(future.utils.text_to_native_str(
+                    util.format_range_a1_notation(
+                        worksheet.title, *cell_range),
+                    encoding='utf-8'))
+        values_api = self._api.sheets.spreadsheets().values()
+        if len(range_strs) == 1:
+            values_api.clear(
+                spreadsheetId=self.key, range=range_strs[0],
+                body={}).execute()
+        elif range_strs:
+            values_api.batchClear(
+                spreadsheetId=self.key,
+                body={'ranges': range_strs}).execute()
+        for view in views:
+            view._mark_cleared()
+
     @property
     def key(self):
         return self._entry['spreadsheetId']
@@ -154,9 +295,13 @@ class Spreadsheet(util.LazyOrderedDictionary):
     @property
     def updated(self):
         if not self._updated:
-            response = self._api.drive.files().get(fileId=self.key).execute()
-            self._updated = datetime.datetime.strptime(
-                response['modifiedDate'], '%Y-%m-%dT%H:%M:%S.%fZ')
+            self._fetch_updated()
+        return self._updated
+
+    def _fetch_updated(self):
+        response = self._api.drive.files().get(fileId=self.key).execute()
+        self._updated = datetime.datetime.strptime(
+            response['modifiedDate'], '%Y-%m-%dT%H:%M:%S.%fZ')
         return self._updated
 
     def _worksheet_enumerator(self):
@@ -165,29 +310,276 @@ class Spreadsheet(util.LazyOrderedDictionary):
             yield (worksheet.title, worksheet)
 
     def _make_single_batch_request(self, method, params):
+        response = self._make_batch_request(
+            [{method: params}], include_spreadsheet=True)
+        return response['updatedSpreadsheet']
+
+    def _make_batch_request(self, requests, include_spreadsheet=False):
         request = {
-            'requests': [{method: params}],
-            'include_spreadsheet_in_response': True,
+            'requests': requests,
         }
-        response = self._api.sheets.spreadsheets().batchUpdate(
+        if include_spreadsheet:
+            request['include_spreadsheet_in_response'] = True
+        return self._api.sheets.spreadsheets().batchUpdate(
             spreadsheetId=self.key, body=request).execute()
-        return response['updatedSpreadsheet']
+
+
+class CellStore(object):
+    """Cache of cell values of a worksheet shared among its views.
+
+    The store remembers which cell ranges have been fetched, so that views
+    overlapping with each other fetch the same cells only once. Values are
+    fetched with |value_render_option|.
+    """
+
+    def __init__(self, worksheet, api, value_render_option='FORMATTED_VALUE'):
+        self._worksheet = worksheet
+        self._api = api
+        self._value_render_option = value_render_option
+        self._rows = {}  # row -> {col -> value}
+        self._loaded_ranges = []  # [(start_row, end_row, start_col, end_col)]
+
+    def clear(self):
+        self._rows.clear()
+        del self._loaded_ranges[:]
+
+    def get(self, row, col):
+        return self._rows.get(row, {}).get(col, '')
+
+    def contains(self, row, col):
+        return col in self._rows.get(row, ())
+
+    def set(self, row, col, value):
+        self._rows.setdefault(row, {})[col] = value
+
+    def _setdefault(self, row, col, value):
+        self._rows.setdefault(row, {}).setdefault(col, value)
+
+    def iter_range(self, start_row, end_row, start_col, end_col):
+        """Iterates over ((row, col), value) of cached cells in a range in
+        row-major order.
+
+        Either the range or the cached cells are walked, whichever is
+        smaller, so that small ranges are cheap in large stores.
+        """
+        if end_row - start_row <= len(self._rows):
+            rows = range(start_row, end_row)
+        else:
+            rows = sorted(
+                row for row in self._rows if start_row <= row < end_row)
+        for row in rows:
+            row_values = self._rows.get(row)
+            if not row_values:
+                continue
+            if end_col - start_col <= len(row_values):
+                cols = (
+                    col for col in range(start_col, end_col)
+                    if col in row_values)
+            else:
+                cols = sorted(
+                    col for col in row_values if start_col <= col < end_col)
+            for col in cols:
+                yield ((row, col), row_values[col])
+
+    def ensure_fetched(self, start_row, end_row, start_col, end_col):
+        cell_range = (start_row, end_row, start_col, end_col)
+        missing_ranges = [cell_range]
+        for loaded_range in self._loaded_ranges:
+            if util.range_contains(loaded_range, cell_range):
+                return
+            missing_ranges = [
+                piece
+                for missing_range in missing_ranges
+                for piece in util.subtract_range(missing_range, loaded_range)]
+        # Cells beyond the grid are known to be empty.
+        grid = (0, self._worksheet.rows, 0, self._worksheet.cols)
+        missing_ranges = [
+            clipped_range for clipped_range in (
+                util.intersect_range(missing_range, grid)
+                for missing_range in missing_ranges)
+            if clipped_range]
+        if missing_ranges:
+            for missing_range, values in zip(
+                    missing_ranges, self._fetch_ranges(missing_ranges)):
+                for i, row in enumerate(values):
+                    index_row = missing_range[0] + i
+                    for j, value in enumerate(row):
+                        index_col = missing_range[2] + j
+                        # Do not overwrite values written locally.
+                        self._setdefault(index_row, index_col, value)
+        self.mark_loaded(*cell_range)
+
+    def load_grid_data(self, grid_data, cell_range):
+        """Stores cells in a GridData returned for a range."""
+        start_row = grid_data.get('startRow', 0)
+        start_col = grid_data.get('startColumn', 0)
+        for i, row_data in enumerate(grid_data.get('rowData', [])):
+            for j, cell_data in enumerate(row_data.get('values', [])):
+                # Do not overwrite values written locally.
+                self._setdefault(
+                    start_row + i, start_col + j,
+                    cell_data.get('formattedValue', ''))
+        cell_range = util.intersect_range(
+            cell_range, (0, self._worksheet.rows, 0, self._worksheet.cols))
+        if cell_range:
+            self.mark_loaded(*cell_range)
+
+    def mark_loaded(self, start_row, end_row, start_col, end_col):
+        if start_row >= end_row or start_col >= end_col:
+            return
+        cell_range = (start_row, end_row, start_col, end_col)
+        self._loaded_ranges = [
+            loaded_range for loaded_range in self._loaded_ranges
+            if not util.range_contains(cell_range, loaded_range)]
+        self._loaded_ranges.append(cell_range)
+
+    def shift(self, axis, at, delta):
+        if axis == 0:
+            rows = {}
+            for row, row_values in self._rows.items():
+                row = util.shift_index(row, at, delta)
+                if row is not None:
+                    rows[row] = row_values
+            self._rows = rows
+        else:
+            for row, row_values in self._rows.items():
+                shifted_values = {}
+                for col, value in row_values.items():
+                    col = util.shift_index(col, at, delta)
+                    if col is not None:
+                        shifted_values[col] = value
+                self._rows[row] = shifted_values
+        self._loaded_ranges = [
+            shifted_range for shifted_range in (
+                util.shift_range(loaded_range, axis, at, delta)
+                for loaded_range in self._loaded_ranges)
+            if shifted_range]
+
+    def invalidate(self, start_row, end_row, start_col, end_col):
+        hole = (start_row, end_row, start_col, end_col)
+        self._loaded_ranges = [
+            piece
+            for loaded_range in self._loaded_ranges
+            for piece in util.subtract_range(loaded_range, hole)]
+        for (row, col), _ in list(self.iter_range(*hole)):
+            row_values = self._rows[row]
+            del row_values[col]
+            if not row_values:
+                del self._rows[row]
+
+    def _fetch_ranges(self, cell_ranges):
+        cell_cache = self._api.cell_cache
+        # The persistent cache keeps formatted values only.
+        if (not cell_cache or
+                self._value_render_option != 'FORMATTED_VALUE'):
+            return self._fetch_values(cell_ranges)
+        spreadsheet = self._worksheet._spreadsheet
+        updated = spreadsheet._fetch_updated()
+        results = [
+            cell_cache.get(
+                spreadsheet.key, self._worksheet.key, cell_range, updated)
+            for cell_range in cell_ranges]
+        missing_indices = [
+            i for i, values in enumerate(results) if values is None]
+        if missing_indices:
+            fetched_results = self._fetch_values(
+                [cell_ranges[i] for i in missing_indices])
+            for i, values in zip(missing_indices, fetched_results):
+                cell_cache.put(
+                    spreadsheet.key, self._worksheet.key, cell_ranges[i],
+                    updated, values)
+                results[i] = values
+        return results
+
+    def _fetch_values(self, cell_ranges):
+        range_strs = [
+            future.utils.text_to_native_str(
+                util.format_range_a1_notation(
+                    self._worksheet.title, *cell_range),
+                encoding='utf-8')
+            for cell_range in cell_ranges]
+        values_api = self._api.sheets.spreadsheets().values()
+        if len(range_strs) == 1:
+            response = values_api.get(
+                spreadsheetId=self._worksheet._spreadsheet.key,
+                range=range_strs[0],
+                majorDimension='ROWS',
+                valueRenderOption=self._value_render_option,
+                dateTimeRenderOption='FORMATTED_STRING').execute()
+            return [response.get('values', [])]
+        response = values_api.batchGet(
+            spreadsheetId=self._worksheet._spreadsheet.key,
+            ranges=range_strs,
+            majorDimension='ROWS',
+            valueRenderOption=self._value_render_option,
+            dateTimeRenderOption='FORMATTED_STRING').execute()
+        return [
+            value_range.get('values', [])
+            for value_range in response['valueRanges']]
 
 
 class WorksheetView(object):
 
-    def __init__(self, worksheet, api, start_row, end_row, start_col, end_col):
+    def __init__(self, worksheet, api, start_row, end_row, start_col, end_col,
+                 auto_resize=False):
         self._worksheet = worksheet
         self._api = api
+        self._auto_resize = auto_resize
         self._reset_size(start_row, end_row, start_col, end_col)
-        self._input_value_map = {}
-        self._cells_fetched = False
         self._queued_updates = []
-
-    def refresh(self):
-        self._input_value_map.clear()
-        self._cells_fetched = False
-        del self._queued_updates[:]
+        self._refreshed_at = None
+
+    def refresh(self, if_modified=False):
+        updated = None
+        if if_modified:
+            updated = self._worksheet._spreadsheet._fetch_updated()
+            if updated == self._refreshed_at and not self._queued_updates:
+                return False
+        self.invalidate()
+        self._refreshed_at = updated
+        return True
+
+    def invalidate(
+            self, start_row=None, end_row=None, start_col=None, end_col=None):
+        start_row, end_row, start_col, end_col = self._absolute_range(
+            start_row, end_row, start_col, end_col)
+        worksheet = self._worksheet
+        for cell_store in worksheet._cell_stores():
+            cell_store.invalidate(start_row, end_row, start_col, end_col)
+        for view in [worksheet] + list(worksheet._views):
+            view._discard_queued_updates(
+                start_row, end_row, start_col, end_col)
+
+    def _discard_queued_updates(self, start_row, end_row, start_col, end_col):
+        self._queued_updates[:] = [
+            (row, col, value) for row, col, value in self._queued_updates
+            if not (start_row <= row < end_row and start_col <= col < end_col)]
+
+    def _shift_queued_updates(self, axis, at, delta):
+        shifted_updates = []
+        for update in self._queued_updates:
+            index = util.shift_index(update[axis], at, delta)
+            if index is not None:
+                update = list(update)
+                update[axis] = index
+                shifted_updates.append(tuple(update))
+        self._queued_updates[:] = shifted_updates
+
+    def _absolute_range(self, start_row, end_row, start_col, end_col):
+        if start_row is None:
+            start_row = 0
+        if end_row is None:
+            end_row = self.rows
+        if start_col is None:
+            start_col = 0
+        if end_col is None:
+            end_col = self.cols
+        if not (0 <= start_row <= end_row <= self.rows):
+            raise IndexError()
+        if not (0 <= start_col <= end_col <= self.cols):
+            raise IndexError()
+        return (self.start_row + start_row, self.start_row + end_row,
+                self.start_col + start_col, self.start_col + end_col)
 
     def _reset_size(self, start_row, end_row, start_col, end_col):
         self.start_row = start_row
@@ -199,28 +591,244 @@ class WorksheetView(object):
             for row in range(start_row, end_row)]
 
     def _ensure_cells_fetched(self):
-        if self._cells_fetched:
+        self._worksheet._cell_store.ensure_fetched(
+            self.start_row, self.end_row, self.start_col, self.end_col)
+
+    def _ensure_formulas_fetched(self):
+        self._worksheet._formula_store.ensure_fetched(
+            self.start_row, self.end_row, self.start_col, self.end_col)
+
+    def _grid_range(self):
+        return {
+            'sheetId': self._worksheet.key,
+            'startRowIndex': self.start_row,
+            'endRowIndex': self.end_row,
+            'startColumnIndex': self.start_col,
+            'endColumnIndex': self.end_col,
+        }
+
+    def sort_range(self, by_columns, ascending=True):
+        if isinstance(by_columns, int):
+            by_columns = [by_columns]
+        if isinstance(ascending, bool):
+            ascending = [ascending] * len(by_columns)
+        if len(ascending) != len(by_columns):
+            raise ValueError(
+                'Got %d sort orders for %d columns' %
+                (len(ascending), len(by_columns)))
+        for col in by_columns:
+            if not (0 <= col < self.cols):
+                raise IndexError()
+        self.commit()
+        self._worksheet._spreadsheet._make_batch_request([{
+            'sortRange': {
+                'range': self._grid_range(),
+                'sortSpecs': [
+                    {
+                        'dimensionIndex': self.start_col + col,
+                        'sortOrder': 'ASCENDING' if asc else 'DESCENDING',
+                    }
+                    for col, asc in zip(by_columns, ascending)
+                ],
+            },
+        }])
+        self.invalidate()
+
+    def copy_to(self, dest_view, paste_type='PASTE_NORMAL'):
+        self.commit()
+        dest_view.commit()
+        source = self._grid_range()
+        spreadsheet = self._worksheet._spreadsheet
+        dest_spreadsheet = dest_view._worksheet._spreadsheet
+        copy_paste = {
+            'copyPaste': {
+                'source': source,
+                'destination': dest_view._grid_range(),
+                'pasteType': paste_type,
+                'pasteOrientation': 'NORMAL',
+            },
+        }
+        if spreadsheet.key == dest_spreadsheet.key:
+            dest_spreadsheet._make_batch_request([copy_paste])
+        else:
+            # copyPaste works within a spreadsheet only. Copy the worksheet
+            # to the destination spreadsheet first, then paste from there.
+            properties = self._worksheet._copy_sheet_to(dest_spreadsheet)
+            source['sheetId'] = properties['sheetId']
+            delete_sheet = {'deleteSheet': {'sheetId': source['sheetId']}}
+            try:
+                dest_spreadsheet._make_batch_request(
+                    [copy_paste, delete_sheet])
+            except Exception:
+                # Do not leave the temporary worksheet behind.
+                dest_spreadsheet._make_batch_request([delete_sheet])
+                raise
+        dest_view._invalidate_pasted(self.rows, self.cols)
+
+    def move_to(self, dest_view, paste_type='PASTE_NORMAL'):
+        spreadsheet = self._worksheet._spreadsheet
+        if spreadsheet.key != dest_view._worksheet._spreadsheet.key:
+            raise ValueError('Cannot move cells to another spreadsheet')
+        self.commit()
+        dest_view.commit()
+        spreadsheet._make_batch_request([{
+            'cutPaste': {
+                'source': self._grid_range(),
+                'destination': {
+                    'sheetId': dest_view._worksheet.key,
+                    'rowIndex': dest_view.start_row,
+                    'columnIndex': dest_view.start_col,
+                },
+                'pasteType': paste_type,
+            },
+        }])
+        self.invalidate()
+        dest_view._invalidate_pasted(self.rows, self.cols)
+
+    def _invalidate_pasted(self, rows, cols):
+        # Pasted cells may spill over the view if it is smaller than the
+        # source range.
+        for cell_store in self._worksheet._cell_stores():
+            cell_store.invalidate(
+                self.start_row, self.start_row + max(self.rows, rows),
+                self.start_col, self.start_col + max(self.cols, cols))
+
+    def find(self, value):
+        """Returns a sorted list of (row, col) of cells equal to |value|."""
+        self._ensure_cells_fetched()
+        if value == '':
+            return [
+                (row, col)
+                for row, view_row in enumerate(self._view_rows)
+                for col, cell_value in enumerate(view_row)
+                if cell_value == '']
+        cell_store = self._worksheet._cell_store
+        return [
+            (row - self.start_row, col - self.start_col)
+            for (row, col), cell_value in cell_store.iter_range(
+                self.start_row, self.end_row, self.start_col, self.end_col)
+            if cell_value == value]
+
+    def iter_nonempty(self):
+        """Iterates over (row, col, value) of non-empty cells in this view.
+
+        Cells are visited in row-major order, with indices relative to this
+        view. Only cached cells are looked up, so empty cells cost nothing.
+        """
+        return (
+            (row - self.start_row, col - self.start_col, value)
+            for (row, col), value in self._nonempty_cells())
+
+    def used_range(self):
+        """Returns (start_row, end_row, start_col, end_col) of the smallest
+        range containing all non-empty cells, relative to this view.
+
+        None is returned if all cells are empty.
+        """
+        cell_range = None
+        for (row, col), _ in self._nonempty_cells():
+            if cell_range is None:
+                cell_range = [row, row + 1, col, col + 1]
+            else:
+                cell_range[0] = min(cell_range[0], row)
+                cell_range[1] = max(cell_range[1], row + 1)
+                cell_range[2] = min(cell_range[2], col)
+                cell_range[3] = max(cell_range[3], col + 1)
+        if cell_range is None:
+            return None
+        return (cell_range[0] - self.start_row, cell_range[1] - self.start_row,
+                cell_range[2] - self.start_col, cell_range[3] - self.start_col)
+
+    def _nonempty_cells(self):
+        # Cells are fetched now rather than when iteration starts.
+        self._ensure_cells_fetched()
+        return (
+            (cell, value)
+            for cell, value in self._worksheet._cell_store.iter_range(
+                self.start_row, self.end_row, self.start_col, self.end_col)
+            if value != '')
+
+    def find_replace(self, find, replace, regex=False, match_case=False,
+                     match_entire_cell=False, include_formulas=False):
+        self.commit()
+        response = self._worksheet._spreadsheet._make_batch_request([{
+            'findReplace': {
+                'find': find,
+                'replacement': replace,
+                'searchByRegex': regex,
+                'matchCase': match_case,
+                'matchEntireCell': match_entire_cell,
+                'includeFormulas': include_formulas,
+                'range': self._grid_range(),
+            },
+        }])
+        occurrences = response['replies'][0].get('findReplace', {}).get(
+            'occurrencesChanged', 0)
+        if occurrences:
+            self.invalidate()
+        return occurrences
+
+    def clear(self):
+        self._worksheet._spreadsheet.clear_ranges([self])
+
+    def _mark_cleared(self):
+        cell_range = (
+            self.start_row, self.end_row, self.start_col, self.end_col)
+        worksheet = self._worksheet
+        for cell_store in worksheet._cell_stores():
+            cell_store.invalidate(*cell_range)
+            # Cleared cells are known to be empty.
+            cell_store.mark_loaded(*cell_range)
+        for view in [worksheet] + list(worksheet._views):
+            view._discard_queued_updates(*cell_range)
+
+    def write_rows(self, rows):
+        """Writes rows to the top-left of this view with one request.
+
+        Unlike writes to cells, this method does not queue updates but sends
+        them immediately.
+        """
+        rows = [[util.format_cell_value(value) for value in row]
+                for row in rows]
+        if len(rows) > self.rows or any(len(row) > self.cols for row in rows):
+            raise ValueError('Rows do not fit in the view')
+        if not rows:
+            return
+        end_col = self.start_col + max(len(row) for row in rows)
+        if end_col == self.start_col:
             return
         range_str = util.format_range_a1_notation(
-            self._worksheet.title, self.start_row, self.end_row,
-            self.start_col, self.end_col)
-        response = self._api.sheets.spreadsheets().values().get(
+            self._worksheet.title, self.start_row, self.start_row + len(rows),
+            self.start_col, end_col)
+        self._api.sheets.spreadsheets().values().update(
             spreadsheetId=self._worksheet._spreadsheet.key,
             range=future.utils.text_to_native_str(range_str, encoding='utf-8'),
-            majorDimension='ROWS',
-            valueRenderOption='FORMATTED_VALUE',
-            dateTimeRenderOption='FORMATTED_STRING').execute()
-        self._input_value_map = {}
-        for i, row in enumerate(response['values']):
-            index_row = self.start_row + i
-            for j, value in enumerate(row):
-                index_col = self.start_col + j
-                self._input_value_map.setdefault((index_row, index_col), value)
-        self._cells_fetched = True
+            valueInputOption='USER_ENTERED',
+            includeValuesInResponse=False,
+            body={
+                'majorDimension': 'ROWS',
+                'values': rows,
+            }).execute()
+        for cell_store in self._worksheet._cell_stores():
+            for i, row in enumerate(rows):
+                for j, value in enumerate(row):
+                    cell_store.set(
+                        self.start_row + i, self.start_col + j, value)
+
+    def formulas(self):
+        """Returns formulas of cells in this view as a list of lists.
+
+        Cells without formulas have their values instead.
+        """
+        return [row.formulas() for row in self._view_rows]
 
     def commit(self):
         if not self._queued_updates:
             return
+        if self._auto_resize:
+            self._worksheet._commit_with_resize(self._queued_updates)
+            del self._queued_updates[:]
+            return
         request = {
             'data': [
                 {
@@ -297,9 +905,10 @@ class WorksheetViewRow(util.CustomMutableFixedList):
             col = self._start_col + index
         if not (self._start_col <= col < self._end_col):
             raise IndexError()
-        if (self._row, col) not in self._view._input_value_map:
+        cell_store = self._view._worksheet._cell_store
+        if not cell_store.contains(self._row, col):
             self._view._ensure_cells_fetched()
-        return self._view._input_value_map.get((self._row, col), '')
+        return cell_store.get(self._row, col)
 
     def __setitem__(self, index, new_value):
         if isinstance(index, slice):
@@ -321,19 +930,10 @@ class WorksheetViewRow(util.CustomMutableFixedList):
             col = self._start_col + index
         if not (self._start_col <= col < self._end_col):
             raise IndexError()
-        if new_value is None:
-            new_value = ''
-        elif isinstance(new_value, int):
-            new_value = '%d' % new_value
-        elif isinstance(new_value, float):
-            # Do best not to lose precision...
-            new_value = '%.20e' % new_value
-        elif isinstance(new_value, bytes):
-            # May raise UnicodeDecodeError.
-            new_value = new_value.decode('ascii')
-        elif not isinstance(new_value, str):
-            new_value = str(new_value)
-        self._view._input_value_map[(self._row, col)] = new_value
+        new_value = util.format_cell_value(new_value)
+        # Written values are entered as if typed, so they are also formulas.
+        for cell_store in self._view._worksheet._cell_stores():
+            cell_store.set(self._row, col, new_value)
         self._view._queued_updates.append((self._row, col, new_value))
 
     def __len__(self):
@@ -341,22 +941,105 @@ class WorksheetViewRow(util.CustomMutableFixedList):
 
     def __iter__(self):
         self._view._ensure_cells_fetched()
+        cell_store = self._view._worksheet._cell_store
         for col in range(self._start_col, self._end_col):
-            yield self._view._input_value_map.get((self._row, col), '')
+            yield cell_store.get(self._row, col)
+
+    def formula(self, index):
+        """Returns the formula of a cell, e.g. '=SUM(A1:A3)'.
+
+        If the cell has no formula, its value is returned. Unlike formatted
+        values, fetched numbers and booleans are returned as they are.
+        """
+        assert isinstance(index, int)
+        if index < 0:
+            col = self._end_col + index
+        else:
+            col = self._start_col + index
+        if not (self._start_col <= col < self._end_col):
+            raise IndexError()
+        formula_store = self._view._worksheet._formula_store
+        if not formula_store.contains(self._row, col):
+            self._view._ensure_formulas_fetched()
+        return formula_store.get(self._row, col)
+
+    def formulas(self):
+        self._view._ensure_formulas_fetched()
+        formula_store = self._view._worksheet._formula_store
+        return [
+            formula_store.get(self._row, col)
+            for col in range(self._start_col, self._end_col)]
 
     def __repr__(self):
         return repr([self[i] for i in range(len(self))])
 
 
+class RowAppender(object):
+    """Buffers rows to be appended to a worksheet.
+
+    Buffered rows are sent with one values().append request when any of
+    |batch_rows|, |batch_bytes| or |flush_interval| seconds is reached, on
+    flush(), or at the end of a with statement.
+    """
+
+    def __init__(self, worksheet, batch_rows=1000, batch_bytes=None,
+                 flush_interval=None):
+        self._worksheet = worksheet
+        self._batch_rows = batch_rows
+        self._batch_bytes = batch_bytes
+        self._flush_interval = flush_interval
+        self._rows = []
+        self._bytes = 0
+        self._last_flush_time = time.time()
+
+    def append(self, row):
+        row = [util.format_cell_value(value) for value in row]
+        self._rows.append(row)
+        # Roughly estimate the size of the request body.
+        self._bytes += sum(len(value) + 4 for value in row) + 4
+        if ((self._batch_rows and len(self._rows) >= self._batch_rows) or
+                (self._batch_bytes and self._bytes >= self._batch_bytes) or
+                (self._flush_interval is not None and
+                 time.time() - self._last_flush_time >=
+                 self._flush_interval)):
+            self.flush()
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def flush(self):
+        if self._rows:
+            self._worksheet._append_values(self._rows)
+        self._rows = []
+        self._bytes = 0
+        self._last_flush_time = time.time()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.flush()
+
+
 class Worksheet(WorksheetView):
 
     def __init__(self, spreadsheet, api, entry):
         self._spreadsheet = spreadsheet
         self._api = api
         self._entry = entry
+        self._cell_store = CellStore(self, api)
+        self._formula_store = CellStore(
+            self, api, value_render_option='FORMULA')
+        self._views = weakref.WeakSet()
         super(Worksheet, self).__init__(self, api, 0, self.rows, 0, self.cols)
 
-    def refresh(self, entry=None):
+    def refresh(self, entry=None, if_modified=False):
+        updated = None
+        if if_modified:
+            updated = self._spreadsheet._fetch_updated()
+            if updated == self._refreshed_at and not self._queued_updates:
+                return False
         if entry is not None:
             self._entry = entry
         else:
@@ -370,25 +1053,314 @@ class Worksheet(WorksheetView):
             else:
                 raise KeyError('Sheet has been removed')
         self._reset_size(0, self.rows, 0, self.cols)
+        for cell_store in self._cell_stores():
+            cell_store.clear()
         super(Worksheet, self).refresh()
-
-    def view(self, start_row=None, end_row=None, start_col=None, end_col=None):
-        if start_row is None:
-            start_row = 0
-        if end_row is None:
-            end_row = self.rows
-        if start_col is None:
-            start_col = 0
-        if end_col is None:
-            end_col = self.cols
-        if not (0 <= start_row <= end_row <= self.rows):
-            raise IndexError()
-        if not (0 <= start_col <= end_col <= self.cols):
-            raise IndexError()
-        return WorksheetView(
+        self._refreshed_at = updated
+        return True
+
+    def view(self, start_row=None, end_row=None, start_col=None, end_col=None,
+             auto_resize=False, clip=False):
+        if auto_resize and clip:
+            raise ValueError('auto_resize and clip cannot be used together')
+        if auto_resize:
+            # The view may extend beyond the grid, which grows on commit.
+            start_row = start_row or 0
+            end_row = self.rows if end_row is None else end_row
+            start_col = start_col or 0
+            end_col = self.cols if end_col is None else end_col
+            if not (0 <= start_row <= end_row and 0 <= start_col <= end_col):
+                raise IndexError()
+        else:
+            start_row, end_row, start_col, end_col = self._absolute_range(
+                start_row, end_row, start_col, end_col)
+        view = WorksheetView(
             self, self._api,
             start_row=start_row, end_row=end_row,
-            start_col=start_col, end_col=end_col)
+            start_col=start_col, end_col=end_col,
+            auto_resize=auto_resize)
+        if clip:
+            # Shrink the view to end at the last row and column with data.
+            # Responses omit trailing empty cells, so this costs one request
+            # proportional to the data.
+            used_range = view.used_range() or (0, 0, 0, 0)
+            view._reset_size(
+                start_row, start_row + used_range[1],
+                start_col, start_col + used_range[3])
+        self._views.add(view)
+        return view
+
+    def insert_rows(self, at, n=1):
+        self._insert_dimension('ROWS', at, n)
+
+    def delete_rows(self, at, n=1):
+        self._delete_dimension('ROWS', at, n)
+
+    def insert_cols(self, at, n=1):
+        self._insert_dimension('COLUMNS', at, n)
+
+    def delete_cols(self, at, n=1):
+        self._delete_dimension('COLUMNS', at, n)
+
+    def _insert_dimension(self, dimension, at, n):
+        size = self.rows if dimension == 'ROWS' else self.cols
+        if n < 1:
+            raise ValueError('n must be positive')
+        if not (0 <= at <= size):
+            raise IndexError()
+        self._spreadsheet._make_batch_request([{
+            'insertDimension': {
+                'range': self._dimension_range(dimension, at, at + n),
+            },
+        }])
+        self._shift(dimension, at, n)
+
+    def _delete_dimension(self, dimension, at, n):
+        size = self.rows if dimension == 'ROWS' else self.cols
+        if n < 1:
+            raise ValueError('n must be positive')
+        if not (0 <= at and at + n <= size):
+            raise IndexError()
+        self._spreadsheet._make_batch_request([{
+            'deleteDimension': {
+                'range': self._dimension_range(dimension, at, at + n),
+            },
+        }])
+        self._shift(dimension, at, -n)
+
+    def _dimension_range(self, dimension, start_index, end_index):
+        return {
+            'sheetId': self.key,
+            'dimension': dimension,
+            'startIndex': start_index,
+            'endIndex': end_index,
+        }
+
+    def _cell_stores(self):
+        return (self._cell_store, self._formula_store)
+
+    def _shift(self, dimension, at, delta):
+        """Shifts cached cells and queued updates of all views after rows or
+        columns are inserted or deleted, so they need not be fetched again.
+
+        Views themselves stay at the same position.
+        """
+        axis = 0 if dimension == 'ROWS' else 1
+        for cell_store in self._cell_stores():
+            cell_store.shift(axis, at, delta)
+        for view in [self] + list(self._views):
+            view._shift_queued_updates(axis, at, delta)
+        grid_properties = self._entry['properties']['gridProperties']
+        grid_properties['rowCount' if axis == 0 else 'columnCount'] += delta
+        self._reset_size(0, self.rows, 0, self.cols)
+        if delta > 0:
+            # Inserted cells are known to be empty.
+            for cell_store in self._cell_stores():
+                if axis == 0:
+                    cell_store.mark_loaded(at, at + delta, 0, self.cols)
+                else:
+                    cell_store.mark_loaded(0, self.rows, at, at + delta)
+
+    def _commit_with_resize(self, updates):
+        # Later updates to the same cell win.
+        cells = dict(((row, col), value) for row, col, value in updates)
+        rows = max(self.rows, max(row for row, _ in cells) + 1)
+        cols = max(self.cols, max(col for _, col in cells) + 1)
+        requests = []
+        for dimension, size, new_size in (('ROWS', self.rows, rows),
+                                          ('COLUMNS', self.cols, cols)):
+            if new_size > size:
+                requests.append({
+                    'appendDimension': {
+                        'sheetId': self.key,
+                        'dimension': dimension,
+                        'length': new_size - size,
+                    },
+                })
+        for start_row, start_col, block in util.coalesce_cells(cells):
+            requests.append({
+                'updateCells': {
+                    'start': {
+                        'sheetId': self.key,
+                        'rowIndex': start_row,
+                        'columnIndex': start_col,
+                    },
+                    'rows': [
+                        {
+                            'values': [
+                                # An empty CellData clears the cell.
+                                {'userEnteredValue':
+                                 util.make_extended_value(value)}
+                                if value != '' else {}
+                                for value in values
+                            ],
+                        }
+                        for values in block
+                    ],
+                    'fields': 'userEnteredValue',
+                },
+            })
+        self._spreadsheet._make_batch_request(requests)
+        # Appended cells are known to be empty except for written ones.
+        for cell_store in self._cell_stores():
+            cell_store.mark_loaded(self.rows, rows, 0, cols)
+            cell_store.mark_loaded(0, self.rows, self.cols, cols)
+        self._grow(rows, cols)
+
+    def _grow(self, rows, cols):
+        """Updates the local grid size after the worksheet has grown."""
+        old_rows = self.rows
+        old_cols = self.cols
+        grid_properties = self._entry['properties']['gridProperties']
+        grid_properties['rowCount'] = max(old_rows, rows)
+        grid_properties['columnCount'] = max(old_cols, cols)
+        if self.cols != old_cols:
+            self._reset_size(0, self.rows, 0, self.cols)
+        else:
+            self.end_row = self.rows
+            self._view_rows.extend(
+                WorksheetViewRow(self, row, 0, self.cols)
+                for row in range(old_rows, self.rows))
+
+    def append_rows(self, rows, batch_rows=1000):
+        with self.appender(batch_rows=batch_rows) as appender:
+            appender.extend(rows)
+
+    def appender(self, batch_rows=1000, batch_bytes=None, flush_interval=None):
+        return RowAppender(
+            self, batch_rows=batch_rows, batch_bytes=batch_bytes,
+            flush_interval=flush_interval)
+
+    def _append_values(self, rows):
+        response = self._api.sheets.spreadsheets().values().append(
+            spreadsheetId=self._spreadsheet.key,
+            range=future.utils.text_to_native_str(
+                util.format_worksheet_title(self.title), encoding='utf-8'),
+            valueInputOption='USER_ENTERED',
+            insertDataOption='INSERT_ROWS',
+            includeValuesInResponse=False,
+            body={
+                'majorDimension': 'ROWS',
+                'values': rows,
+            }).execute()
+        _, start_row, _, _, _ = util.parse_range_a1_notation(
+            response['updates']['updatedRange'])
+        self._grow(self.rows + len(rows), self.cols)
+        # Rows at and after the appended ones have been shifted.
+        for cell_store in self._cell_stores():
+            cell_store.shift(0, start_row, len(rows))
+            cell_store.invalidate(
+                start_row, start_row + len(rows), 0, self.cols)
+        for view in [self] + list(self._views):
+            view._shift_queued_updates(0, start_row, len(rows))
+
+    def load_delimited(self, fileobj, delimiter=',', chunk_bytes=1024 * 1024,
+                       start_row=0):
+        num_records = 0
+        for text, chunk_records, chunk_cols, _ in util.read_delimited_chunks(
+                fileobj, delimiter=delimiter, chunk_bytes=chunk_bytes):
+            self._paste_delimited(
+                text, start_row + num_records, 0, chunk_records, chunk_cols,
+                delimiter)
+            num_records += chunk_records
+        return num_records
+
+    def paste_delimited(self, text, start_row=0, start_col=0, delimiter=','):
+        records = util.parse_delimited(text, delimiter)
+        self._paste_delimited(
+            text, start_row, start_col, len(records),
+            max([len(record) for record in records] or [0]), delimiter)
+
+    def _paste_delimited(
+            self, text, start_row, start_col, num_records, num_cols,
+            delimiter):
+        end_row = start_row + num_records
+        end_col = start_col + num_cols
+        requests = []
+        for dimension, size, end in (('ROWS', self.rows, end_row),
+                                     ('COLUMNS', self.cols, end_col)):
+            if end > size:
+                requests.append({
+                    'appendDimension': {
+                        'sheetId': self.key,
+                        'dimension': dimension,
+                        'length': end - size,
+                    },
+                })
+        requests.append({
+            'pasteData': {
+                'coordinate': {
+                    'sheetId': self.key,
+                    'rowIndex': start_row,
+                    'columnIndex': start_col,
+                },
+                'data': text,
+                'type': 'PASTE_NORMAL',
+                'delimiter': delimiter,
+            },
+        })
+        self._spreadsheet._make_batch_request(requests)
+        self._grow(end_row, end_col)
+        for cell_store in self._cell_stores():
+            cell_store.invalidate(start_row, end_row, start_col, end_col)
+
+    def export_csv(self, fileobj, delimiter=',', page_rows=1000,
+                   use_drive=False):
+        """Writes all cells to a file object in CSV format.
+
+        Cells are fetched in pages of |page_rows| rows and written out
+        immediately without being cached. Trailing empty rows are omitted.
+        If |use_drive| is true, the CSV file exported by Google Drive is
+        downloaded instead.
+        """
+        if use_drive:
+            if delimiter != ',':
+                raise ValueError('Drive exports comma-separated values only')
+            self._export_csv_from_drive(fileobj)
+            return
+        writer = csv.writer(
+            fileobj, delimiter=future.utils.native_str(delimiter))
+        empty_rows = 0
+        for start_row in range(0, self.rows, page_rows):
+            end_row = min(start_row + page_rows, self.rows)
+            values, = self._cell_store._fetch_values(
+                [(start_row, end_row, 0, self.cols)])
+            for i in range(end_row - start_row):
+                row = values[i] if i < len(values) else []
+                if not row:
+                    empty_rows += 1
+                    continue
+                for _ in range(empty_rows):
+                    writer.writerow([])
+                empty_rows = 0
+                if future.utils.PY2:
+                    row = [value.encode('utf-8') for value in row]
+                writer.writerow(row)
+
+    def _export_csv_from_drive(self, fileobj):
+        uri = (
+            'https://docs.google.com/spreadsheets/d/%s/export?'
+            'format=csv&gid=%d' % (self._spreadsheet.key, self.key))
+        response, content = self._api.http.request(uri)
+        if response.status != 200:
+            raise googleapiclient.errors.HttpError(response, content, uri=uri)
+        if not future.utils.PY2:
+            content = content.decode('utf-8')
+        fileobj.write(content)
+
+    def copy_to_spreadsheet(self, spreadsheet):
+        properties = self._copy_sheet_to(spreadsheet)
+        new_entry = dict(spreadsheet._entry)
+        new_entry['sheets'] = new_entry['sheets'] + [
+            {'properties': properties}]
+        spreadsheet.refresh(new_entry)
+        return spreadsheet[properties['title']]
+
+    def _copy_sheet_to(self, spreadsheet):
+        return self._api.sheets.spreadsheets().sheets().copyTo(
+            spreadsheetId=self._spreadsheet.key,
+            sheetId=self.key,
+            body={'destinationSpreadsheetId': spreadsheet.key}).execute()
 
     def set_size(self, rows, cols):
         assert isinstance(rows, int) and rows > 0
@@ -0,0 +1,333 @@
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import collections
+import hashlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from future.moves.urllib import parse
+
+from . import util
+
+
+RequestEvent = collections.namedtuple(
+    'RequestEvent',
+    ['api_method', 'method', 'uri', 'body', 'status', 'request_bytes',
+     'response_bytes', 'start_time', 'latency', 'error', 'retry'])
+
+_VERSION_RE = re.compile(r'^v\d+$')
+_VERB_RE = re.compile(r':([a-z][A-Za-z]*)$')
+_DEFAULT_VERBS = {
+    'GET': ('list', 'get'),
+    'POST': ('create', 'create'),
+    'PUT': ('update', 'update'),
+    'PATCH': ('patch', 'patch'),
+    'DELETE': ('delete', 'delete'),
+}
+
+
+def api_method_name(method, uri):
+    """Returns a name of the API method called by an HTTP request.
+
+    For example, 'sheets.spreadsheets.values.get' is returned for a GET
+    request to https://sheets.googleapis.com/v4/spreadsheets/<key>/values/A1.
+    """
+    _, netloc, path, _, _, _ = parse.urlparse(uri)
+    if 'discovery' in path:
+        return 'discovery'
+    if netloc == 'docs.google.com':
+        return 'docs.export'
+    segments = [segment for segment in path.split('/') if segment]
+    verb = None
+    if segments:
+        m = _VERB_RE.search(segments[-1])
+        if m:
+            verb = m.group(1)
+            segments[-1] = segments[-1][:m.start()]
+    service = netloc.split('.')[0]
+    for i, segment in enumerate(segments):
+        if _VERSION_RE.match(segment):
+            if i > 0:
+                service = segments[0]
+            segments = segments[i + 1:]
+            break
+    # Resource names and IDs alternate, e.g. spreadsheets/<key>/values/A1.
+    names = segments[::2]
+    if verb is None:
+        collection_verb, resource_verb = _DEFAULT_VERBS.get(
+            method, (method.lower(), method.lower()))
+        has_id = segments and len(segments) % 2 == 0
+        verb = resource_verb if has_id else collection_verb
+    return '.'.join([service] + names + [verb])
+
+
+class InstrumentedHttp(object):
+    """Wraps an httplib2.Http-like object to notify observers of requests.
+
+    Observers are objects with an observe(event) method, where |event| is
+    a RequestEvent. Note that observers are called synchronously.
+    """
+
+    def __init__(self, http, observers):
+        self._http = http
+        self._observers = list(observers)
+        self._last_failed_request = None
+
+    def request(self, uri, method='GET', body=None, *args, **kwargs):
+        start_time = time.time()
+        response = content = error = None
+        try:
+            response, content = self._http.request(
+                uri, method, body, *args, **kwargs)
+            return response, content
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            latency = time.time() - start_time
+            status = response.status if response is not None else None
+            # Requests identical to the last failed one are retries.
+            request_key = (method, uri, body)
+            retry = request_key == self._last_failed_request
+            if error is not None or status >= 400:
+                self._last_failed_request = request_key
+            else:
+                self._last_failed_request = None
+            event = RequestEvent(
+                api_method=api_method_name(method, uri),
+                method=method,
+                uri=uri,
+                body=body,
+                status=status,
+                request_bytes=len(body) if body else 0,
+                response_bytes=len(content) if content else 0,
+                start_time=start_time,
+                latency=latency,
+                error=error,
+                retry=retry)
+            for observer in self._observers:
+                observer.observe(event)
+
+    def __getattr__(self, name):
+        return getattr(self._http, name)
+
+
+class RequestStats(object):
+    """Collects statistics of API requests per API method.
+
+    Pass an instance to login() as one of |observers|.
+    """
+
+    DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, latency_buckets=DEFAULT_LATENCY_BUCKETS):
+        self._latency_buckets = tuple(sorted(latency_buckets))
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def observe(self, event):
+        with self._lock:
+            stats = self._stats.get(event.api_method)
+            if stats is None:
+                stats = self._stats[event.api_method] = {
+                    'count': 0,
+                    'errors': 0,
+                    'retries': 0,
+                    'request_bytes': 0,
+                    'response_bytes': 0,
+                    'latency_sum': 0.0,
+                    'latency_buckets': [0] * len(self._latency_buckets),
+                }
+            stats['count'] += 1
+            if event.error is not None or event.status >= 400:
+                stats['errors'] += 1
+            if event.retry:
+                stats['retries'] += 1
+            stats['request_bytes'] += event.request_bytes
+            stats['response_bytes'] += event.response_bytes
+            stats['latency_sum'] += event.latency
+            for i, bound in enumerate(self._latency_buckets):
+                if event.latency <= bound:
+                    stats['latency_buckets'][i] += 1
+                    break
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def to_dict(self):
+        """Returns statistics as a dict keyed by API method names.
+
+        Latency buckets are cumulative, keyed by their upper bounds.
+        """
+        with self._lock:
+            result = {}
+            for api_method, stats in self._stats.items():
+                stats = dict(stats)
+                cumulative_count = 0
+                latency_buckets = collections.OrderedDict()
+                for bound, count in zip(
+                        self._latency_buckets, stats['latency_buckets']):
+                    cumulative_count += count
+                    latency_buckets[bound] = cumulative_count
+                stats['latency_buckets'] = latency_buckets
+                result[api_method] = stats
+            return result
+
+    def to_prometheus(self, prefix='hyou'):
+        """Returns statistics in Prometheus text exposition format."""
+        stats_dict = self.to_dict()
+        lines = []
+        for name, key, help_text in (
+                ('requests_total', 'count', 'Number of API requests.'),
+                ('request_errors_total', 'errors',
+                 'Number of failed API requests.'),
+                ('request_retries_total', 'retries',
+                 'Number of retried API requests.'),
+                ('request_bytes_total', 'request_bytes',
+                 'Total size of request bodies.'),
+                ('response_bytes_total', 'response_bytes',
+                 'Total size of response bodies.')):
+            lines.append('# HELP %s_%s %s' % (prefix, name, help_text))
+            lines.append('# TYPE %s_%s counter' % (prefix, name))
+            for api_method in sorted(stats_dict):
+                lines.append('%s_%s{method="%s"} %d' % (
+                    prefix, name, api_method, stats_dict[api_method][key]))
+        name = '%s_request_latency_seconds' % prefix
+        lines.append('# HELP %s Latency of API requests.' % name)
+        lines.append('# TYPE %s histogram' % name)
+        for api_method in sorted(stats_dict):
+            stats = stats_dict[api_method]
+            for bound, count in stats['latency_buckets'].items():
+                lines.append('%s_bucket{method="%s",le="%s"} %d' % (
+                    name, api_method, _format_float(bound), count))
+            lines.append('%s_bucket{method="%s",le="+Inf"} %d' % (
+                name, api_method, stats['count']))
+            lines.append('%s_sum{method="%s"} %s' % (
+                name, api_method, _format_float(stats['latency_sum'])))
+            lines.append('%s_count{method="%s"} %d' % (
+                name, api_method, stats['count']))
+        return ''.join(line + '\n' for line in lines)
+
+
+def _format_float(value):
+    return repr(float(value))
+
+
+class RequestTracer(object):
+    """Writes every request to a JSON Lines trace file.
+
+    Each line records the API method, the canonical URI, a hash of the
+    request body, sizes, timing, and the hyou methods and the caller which
+    caused the request. Pass an instance to login() as one of |observers|.
+    The trace can be summarized by tools/analyze_trace.py.
+    """
+
+    def __init__(self, path_or_fileobj):
+        if isinstance(path_or_fileobj, (str, bytes)):
+            self._file = open(path_or_fileobj, 'a', encoding='utf-8')
+            self._owns_file = True
+        else:
+            self._file = path_or_fileobj
+            self._owns_file = False
+        self._lock = threading.Lock()
+
+    def observe(self, event):
+        call_stack, caller = _find_call_site()
+        record = {
+            'api_method': event.api_method,
+            'method': event.method,
+            'uri': util.canonicalize_uri(event.uri),
+            'body_sha1': _hash_body(event.body),
+            'status': event.status,
+            'request_bytes': event.request_bytes,
+            'response_bytes': event.response_bytes,
+            'start_time': event.start_time,
+            'latency': event.latency,
+            'error': repr(event.error) if event.error is not None else None,
+            'retry': event.retry,
+            'entry_point': call_stack[0] if call_stack else None,
+            'call_stack': call_stack,
+            'caller': caller,
+        }
+        line = str(json.dumps(record, sort_keys=True)) + '\n'
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        if self._owns_file:
+            self._file.close()
+
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Modules wrapping the transport are not interesting as call sites.
+_TRANSPORT_MODULES = ('instrumentation', 'transport')
+
+
+def _is_hyou_frame(frame):
+    filename = os.path.abspath(frame.f_code.co_filename)
+    module = os.path.splitext(os.path.basename(filename))[0]
+    return (os.path.dirname(filename) == _PACKAGE_DIR and
+            module not in _TRANSPORT_MODULES)
+
+
+def _frame_name(frame):
+    code = frame.f_code
+    qualname = getattr(code, 'co_qualname', None)
+    if qualname:
+        return qualname
+    self = frame.f_locals.get('self')
+    if self is not None:
+        return '%s.%s' % (type(self).__name__, code.co_name)
+    return code.co_name
+
+
+def _find_call_site():
+    """Returns hyou methods in the current stack, outermost first, and the
+    location of the code calling the outermost one.
+    """
+    call_stack = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        if _is_hyou_frame(frame):
+            call_stack.append(_frame_name(frame))
+        elif call_stack:
+            return call_stack[::-1], '%s:%d:%s' % (
+                frame.f_code.co_filename, frame.f_lineno,
+                frame.f_code.co_name)
+        frame = frame.f_back
+    return call_stack[::-1], None
+
+
+def _hash_body(body):
+    if body is None:
+        return None
+    try:
+        body = util.canonicalize_json(body)
+    except ValueError:
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+    return hashlib.sha1(body).hexdigest()
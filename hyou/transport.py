@@ -0,0 +1,83 @@
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import gzip
+import io
+
+
+GZIP_USER_AGENT = '(gzip)'
+_COMPRESSED_METHODS = ('POST', 'PUT', 'PATCH')
+
+
+def gzip_compress(data):
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+def gzip_decompress(data):
+    with gzip.GzipFile(fileobj=io.BytesIO(data), mode='rb') as f:
+        return f.read()
+
+
+class GzipHttp(object):
+    """Wraps an httplib2.Http-like object to use gzip on the wire.
+
+    Every request asks for gzip-compressed responses, and its User-Agent
+    contains "gzip", which Google servers require to compress responses.
+    httplib2 decompresses responses transparently.
+
+    If |compress_threshold| is given, request bodies of at least that many
+    bytes are compressed and sent with "Content-Encoding: gzip".
+    """
+
+    def __init__(self, http, compress_threshold=None):
+        self._http = http
+        self._compress_threshold = compress_threshold
+
+    def request(self, uri, method='GET', body=None, headers=None,
+                *args, **kwargs):
+        headers = dict(headers or {})
+        lower_names = dict((name.lower(), name) for name in headers)
+        if 'accept-encoding' not in lower_names:
+            headers['accept-encoding'] = 'gzip, deflate'
+        user_agent_name = lower_names.get('user-agent', 'user-agent')
+        user_agent = headers.get(user_agent_name, '')
+        if 'gzip' not in user_agent:
+            headers[user_agent_name] = (
+                '%s %s' % (user_agent, GZIP_USER_AGENT)
+                if user_agent else GZIP_USER_AGENT)
+        if (self._compress_threshold is not None and
+                body is not None and
+                method in _COMPRESSED_METHODS and
+                'content-encoding' not in lower_names and
+                len(body) >= self._compress_threshold):
+            body = gzip_compress(body)
+            headers['content-encoding'] = 'gzip'
+            # The length set by the caller is of the uncompressed body.
+            headers.pop(lower_names.get('content-length'), None)
+            headers['content-length'] = str(len(body))
+        return self._http.request(uri, method, body, headers, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._http, name)
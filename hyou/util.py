@@ -18,8 +18,15 @@ from builtins import (  # noqa: F401
     ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
     object, oct, open, pow, range, round, str, super, zip)
 
+import collections
+import csv
+import io
 import json
+import re
+import time
 
+from future.moves.urllib import parse
+import future.utils
 import oauth2client.client
 import oauth2client.service_account
 
@@ -42,16 +49,335 @@ def format_column_address(index_column):
     return s
 
 
+def parse_column_address(column_address):
+    k = 0
+    for c in column_address:
+        k = k * 26 + ord(c) - ord('A') + 1
+    return k - 1
+
+
+def format_worksheet_title(worksheet_title):
+    return '\'%s\'' % worksheet_title.replace('\'', '\'\'')
+
+
 def format_range_a1_notation(
         worksheet_title, start_row, end_row, start_col, end_col):
-    return '\'%s\'!%s%d:%s%d' % (
-        worksheet_title.replace('\'', '\'\''),
+    return '%s!%s%d:%s%d' % (
+        format_worksheet_title(worksheet_title),
         format_column_address(start_col),
         start_row + 1,
         format_column_address(end_col - 1),
         end_row)
 
 
+_CELL_RANGE_RE = re.compile(r'^([A-Z]+)(\d+)(?::([A-Z]+)(\d+))?$')
+
+
+def parse_range_a1_notation(range_str):
+    """Parses a range in A1 notation returned by Sheets API.
+
+    Returns a tuple of (worksheet_title, start_row, end_row, start_col,
+    end_col). worksheet_title is None if the range does not specify one.
+    """
+    worksheet_title = None
+    if '!' in range_str:
+        worksheet_title, range_str = range_str.rsplit('!', 1)
+        if worksheet_title.startswith('\''):
+            worksheet_title = worksheet_title[1:-1].replace('\'\'', '\'')
+    m = _CELL_RANGE_RE.match(range_str)
+    if not m:
+        raise ValueError('Unsupported range: %s' % range_str)
+    start_col, start_row, end_col, end_row = m.groups()
+    if end_col is None:
+        end_col, end_row = start_col, start_row
+    return (worksheet_title, int(start_row) - 1, int(end_row),
+            parse_column_address(start_col),
+            parse_column_address(end_col) + 1)
+
+
+_OPEN_RANGE_RE = re.compile(r'^([A-Z]*)(\d*)(?::([A-Z]*)(\d*))?$')
+
+
+def parse_worksheet_range_a1_notation(range_str):
+    """Parses a range in A1 notation which may be a worksheet title only.
+
+    Returns a tuple of (worksheet_title, cell_range), where cell_range is
+    None if the range covers the whole worksheet. Whole rows and columns
+    such as "Sheet1!A:C", "Sheet1!2:5" and "Sheet1!A2:C" are supported,
+    and their open ends are None in cell_range.
+    """
+    if '!' not in range_str:
+        if _CELL_RANGE_RE.match(range_str) or (
+                ':' in range_str and _OPEN_RANGE_RE.match(range_str)):
+            raise ValueError('Worksheet title is missing: %s' % range_str)
+        worksheet_title = range_str
+        if worksheet_title.startswith('\''):
+            worksheet_title = worksheet_title[1:-1].replace('\'\'', '\'')
+        return (worksheet_title, None)
+    worksheet_title, cells_str = range_str.rsplit('!', 1)
+    if worksheet_title.startswith('\''):
+        worksheet_title = worksheet_title[1:-1].replace('\'\'', '\'')
+    m = _OPEN_RANGE_RE.match(cells_str)
+    if not m:
+        raise ValueError('Unsupported range: %s' % range_str)
+    start_col, start_row, end_col, end_row = m.groups()
+    if end_col is None and end_row is None:
+        # A single cell.
+        end_col, end_row = start_col, start_row
+    if (bool(start_col) != bool(end_col) or
+            (end_row and not start_row) or
+            not (start_col or start_row)):
+        raise ValueError('Unsupported range: %s' % range_str)
+    return (worksheet_title, (
+        int(start_row) - 1 if start_row else 0,
+        int(end_row) if end_row else None,
+        parse_column_address(start_col) if start_col else 0,
+        parse_column_address(end_col) + 1 if end_col else None))
+
+
+def format_cell_value(value):
+    """Converts a Python value to a string to be written to a cell."""
+    if value is None:
+        return ''
+    elif isinstance(value, int):
+        return '%d' % value
+    elif isinstance(value, float):
+        # Do best not to lose precision...
+        return '%.20e' % value
+    elif isinstance(value, bytes):
+        # May raise UnicodeDecodeError.
+        return value.decode('ascii')
+    elif not isinstance(value, str):
+        return str(value)
+    return value
+
+
+def range_contains(outer, inner):
+    """Checks if a cell range contains another.
+
+    Cell ranges are tuples of (start_row, end_row, start_col, end_col).
+    """
+    return (outer[0] <= inner[0] and inner[1] <= outer[1] and
+            outer[2] <= inner[2] and inner[3] <= outer[3])
+
+
+def range_intersects(a, b):
+    return (max(a[0], b[0]) < min(a[1], b[1]) and
+            max(a[2], b[2]) < min(a[3], b[3]))
+
+
+def intersect_range(a, b):
+    """Returns the intersection of two cell ranges, or None if empty."""
+    if not range_intersects(a, b):
+        return None
+    return (max(a[0], b[0]), min(a[1], b[1]),
+            max(a[2], b[2]), min(a[3], b[3]))
+
+
+def subtract_range(cell_range, hole):
+    """Returns disjoint cell ranges covering |cell_range| minus |hole|."""
+    if not range_intersects(cell_range, hole):
+        return [cell_range]
+    start_row, end_row, start_col, end_col = cell_range
+    hole_start_row = max(start_row, hole[0])
+    hole_end_row = min(end_row, hole[1])
+    pieces = [
+        (start_row, hole_start_row, start_col, end_col),
+        (hole_end_row, end_row, start_col, end_col),
+        (hole_start_row, hole_end_row, start_col, max(start_col, hole[2])),
+        (hole_start_row, hole_end_row, min(end_col, hole[3]), end_col),
+    ]
+    return [p for p in pieces if p[0] < p[1] and p[2] < p[3]]
+
+
+def shift_index(index, at, delta):
+    """Returns |index| after |delta| rows or columns are inserted at |at|.
+
+    A negative |delta| means deletion. Returns None if |index| is deleted.
+    """
+    if index < at:
+        return index
+    if index < at - delta:
+        return None
+    return index + delta
+
+
+def shift_range(cell_range, axis, at, delta):
+    """Returns |cell_range| after rows (|axis| = 0) or columns (|axis| = 1)
+    are inserted or deleted. Returns None if the range is deleted entirely.
+    """
+    bounds = list(cell_range)
+    start, end = bounds[axis * 2:axis * 2 + 2]
+    if delta > 0:
+        if start >= at:
+            start += delta
+        if end > at:
+            end += delta
+    else:
+        if start > at:
+            start = max(at, start + delta)
+        if end > at:
+            end = max(at, end + delta)
+    if start >= end:
+        return None
+    bounds[axis * 2:axis * 2 + 2] = [start, end]
+    return tuple(bounds)
+
+
+def coalesce_cells(cells):
+    """Groups cells into rectangular blocks.
+
+    |cells| is a dict mapping (row, col) to a value. Returns a list of
+    (start_row, start_col, rows) where |rows| is a list of lists of values.
+    """
+    runs = []
+    for row, col in sorted(cells):
+        if runs:
+            run_row, run_col, run_values = runs[-1]
+            if run_row == row and run_col + len(run_values) == col:
+                run_values.append(cells[(row, col)])
+                continue
+        runs.append((row, col, [cells[(row, col)]]))
+    blocks = []
+    for row, col, values in runs:
+        if blocks:
+            block_row, block_col, block_rows = blocks[-1]
+            if (block_row + len(block_rows) == row and block_col == col and
+                    len(block_rows[0]) == len(values)):
+                block_rows.append(values)
+                continue
+        blocks.append((row, col, [values]))
+    return blocks
+
+
+_NUMBER_RE = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+
+
+def make_extended_value(value):
+    """Converts a Python value to an ExtendedValue of Sheets API.
+
+    This mimics how user-entered strings are interpreted: a leading
+    apostrophe forces a string, and formulas, numbers and booleans are
+    recognized. Unlike user entry, dates, times, percentages, currencies
+    and numbers with thousands separators are kept as strings.
+    """
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, (int, float)):
+        return {'numberValue': value}
+    value = format_cell_value(value)
+    if value.startswith('\''):
+        return {'stringValue': value[1:]}
+    if value.startswith('='):
+        return {'formulaValue': value}
+    if _NUMBER_RE.match(value):
+        return {'numberValue': float(value)}
+    if value.upper() in ('TRUE', 'FALSE'):
+        return {'boolValue': value.upper() == 'TRUE'}
+    return {'stringValue': value}
+
+
+def read_delimited_chunks(fileobj, delimiter=',', chunk_bytes=1024 * 1024):
+    """Splits delimited text into chunks at record boundaries.
+
+    Records are not parsed; a line ends a record if the record contains an
+    even number of double quotes so far. |fileobj| may be opened in either
+    binary or text mode.
+
+    Yields tuples of (text, num_records, max_cols, size). Only records
+    containing double quotes are parsed to count columns. size is the
+    number of bytes (or characters for text files) consumed from |fileobj|
+    for the chunk.
+    """
+    chunk_records = []
+    chunk_size = 0
+    chunk_cols = 0
+    record_lines = []
+    record_size = 0
+    record_quotes = 0
+    while True:
+        line = fileobj.readline()
+        if line:
+            record_size += len(line)
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            record_lines.append(line)
+            record_quotes += line.count('"')
+            if record_quotes % 2 == 1:
+                continue
+        if record_lines:
+            record = ''.join(record_lines)
+            if chunk_records and chunk_size + record_size > chunk_bytes:
+                yield (_join_records(chunk_records), len(chunk_records),
+                       chunk_cols, chunk_size)
+                chunk_records = []
+                chunk_size = 0
+                chunk_cols = 0
+            chunk_records.append(record)
+            chunk_size += record_size
+            if record_quotes:
+                record_cols = count_delimited_cols(record, delimiter)
+            else:
+                record_cols = record.count(delimiter) + 1
+            chunk_cols = max(chunk_cols, record_cols)
+            record_lines = []
+            record_size = 0
+            record_quotes = 0
+        if not line:
+            break
+    if chunk_records:
+        yield (_join_records(chunk_records), len(chunk_records), chunk_cols,
+               chunk_size)
+
+
+def parse_delimited(text, delimiter=','):
+    """Parses delimited text into a list of records."""
+    delimiter = future.utils.native_str(delimiter)
+    if future.utils.PY2:
+        reader = csv.reader(io.BytesIO(text.encode('utf-8')),
+                            delimiter=delimiter)
+        return [[value.decode('utf-8') for value in record]
+                for record in reader]
+    reader = csv.reader(io.StringIO(text, newline=''), delimiter=delimiter)
+    return [list(record) for record in reader]
+
+
+def count_delimited_cols(text, delimiter=','):
+    """Returns the maximum number of columns of records in delimited text."""
+    return max([len(record) for record in parse_delimited(text, delimiter)] or
+               [0])
+
+
+def _join_records(records):
+    text = ''.join(records)
+    if text.endswith('\r\n'):
+        return text[:-2]
+    if text.endswith('\n'):
+        return text[:-1]
+    return text
+
+
+def canonicalize_uri(uri):
+    """Sorts query parameters of a URI so equivalent URIs compare equal."""
+    scheme, netloc, path, params, query, fragment = parse.urlparse(uri)
+    if query:
+        query = parse.urlencode(sorted(parse.parse_qsl(query)))
+    return parse.urlunparse((scheme, netloc, path, params, query, fragment))
+
+
+def canonicalize_json(body_json):
+    """Serializes JSON text in the canonical form as bytes."""
+    # body_json can be bytes or str.
+    if isinstance(body_json, str):
+        json_str = body_json
+    else:
+        json_str = body_json.decode('utf-8')
+    json_data = json.loads(json_str)
+    canonicalized_json_binary = json.dumps(
+        json_data, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return canonicalized_json_binary
+
+
 def parse_credentials(json_text):
     json_data = json.loads(json_text)
     if '_module' in json_data:
@@ -67,18 +393,36 @@ def parse_credentials(json_text):
 
 
 class LazyOrderedDictionary(object):
+    """Dictionary-like object whose entries are built on demand.
+
+    If |max_values| is given, least recently used values are evicted when
+    more values are held. If |ttl| is given, values older than |ttl| seconds
+    are discarded; expired values are also released from the least recently
+    used end whenever another entry is accessed. Evicted values are rebuilt
+    by |constructor| on next access, and enumeration still returns their
+    keys.
+    """
 
-    def __init__(self, enumerator, constructor):
+    def __init__(self, enumerator, constructor, max_values=None, ttl=None):
+        if (max_values is not None or ttl is not None) and not constructor:
+            raise ValueError('eviction requires a constructor')
+        if max_values is not None and max_values < 1:
+            raise ValueError('max_values must be positive')
         self._enumerator = enumerator
         self._constructor = constructor
+        self._max_values = max_values
+        self._ttl = ttl
         self._cache_list = []   # [(key, value)]
         self._cache_index = {}  # key -> index of _cache_list
         self._enumerated = False
+        # key -> time the value was built, in the least recently used order
+        self._value_times = collections.OrderedDict()
 
     def refresh(self):
         del self._cache_list[:]
         self._cache_index.clear()
         self._enumerated = False
+        self._value_times.clear()
 
     def __len__(self):
         self._ensure_enumerated()
@@ -121,9 +465,7 @@ class LazyOrderedDictionary(object):
         if self._constructor:
             value = self._constructor(key)
             if value is not None:
-                index = len(self._cache_list)
-                self._cache_index[key] = index
-                self._cache_list.append((key, value))
+                self._set_value(key, value)
                 return value
         self._ensure_enumerated()
         index = self._cache_index.get(key)
@@ -152,18 +494,61 @@ class LazyOrderedDictionary(object):
                 index = self._cache_index.get(key)
                 if index is None:
                     index = len(self._cache_list)
+                    self._cache_index[key] = index
                     self._cache_list.append((None, None))
                 self._cache_list[index] = (key, value)
             self._enumerated = True
 
     def _get_value(self, index):
         key, value = self._cache_list[index]
+        built = False
+        if value is not None and self._is_expired(key):
+            value = None
         if value is None:
             value = self._constructor(key)
             assert value is not None
             self._cache_list[index] = (key, value)
+            built = True
+        self._touch(key, built=built)
         return value
 
+    def _set_value(self, key, value):
+        index = self._cache_index.get(key)
+        if index is None:
+            index = len(self._cache_list)
+            self._cache_index[key] = index
+            self._cache_list.append((key, value))
+        else:
+            self._cache_list[index] = (key, value)
+        self._touch(key, built=True)
+
+    def _is_expired(self, key):
+        if self._ttl is None:
+            return False
+        built_time = self._value_times.get(key)
+        return built_time is not None and time.time() - built_time >= self._ttl
+
+    def _touch(self, key, built):
+        if self._max_values is None and self._ttl is None:
+            return
+        built_time = self._value_times.pop(key, None)
+        if built or built_time is None:
+            built_time = time.time()
+        self._value_times[key] = built_time
+        while (self._max_values is not None and
+               len(self._value_times) > self._max_values):
+            self._evict_least_recently_used()
+        # Release expired values which have not been accessed since.
+        while self._ttl is not None:
+            oldest_key = next(iter(self._value_times))
+            if not self._is_expired(oldest_key):
+                break
+            self._evict_least_recently_used()
+
+    def _evict_least_recently_used(self):
+        evicted_key, _ = self._value_times.popitem(last=False)
+        self._cache_list[self._cache_index[evicted_key]] = (evicted_key, None)
+
 
 class CustomMutableFixedList(object):
     """Provides methods to mimic a mutable fixed-size Python list.
@@ -224,13 +609,16 @@ class CustomMutableFixedList(object):
         raise ValueError('%r is not in list' % find_value)
 
     def reverse(self):
-        for i, new_value in enumerate(list(reversed(self))):
-            self[i] = new_value
+        self._assign_changed(list(reversed(self)))
 
     def sort(self, key=None, reverse=False):
-        for i, new_value in enumerate(sorted(
-                self, key=key, reverse=reverse)):
-            self[i] = new_value
+        self._assign_changed(sorted(self, key=key, reverse=reverse))
+
+    def _assign_changed(self, new_values):
+        for i, (old_value, new_value) in enumerate(
+                zip(list(self), new_values)):
+            if new_value != old_value:
+                self[i] = new_value
 
     def __delitem__(self, key):
         raise NotImplementedError(
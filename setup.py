@@ -34,6 +34,8 @@ setuptools.setup(
     url='https://github.com/google/hyou/',
     packages=['hyou'],
     scripts=[
+        'tools/analyze_trace.py',
+        'tools/download_sheet.py',
         'tools/generate_oauth2_credentials.py',
         'tools/upload_sheet.py',
     ],
@@ -0,0 +1,331 @@
+#!/usr/bin/python
+#
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Benchmarks hyou on synthetic worksheets without network access.
+
+Usage:
+PYTHONPATH=. python test/benchmarks.py [--sizes=1000,10000,...]
+                                       [--cols=N] [--repeat=N]
+                                       [--wire_sizes=100000,...]
+                                       [--bandwidth_kbps=N]
+                                       [--output=FILE]
+
+Results are written as JSON so they can be compared between commits.
+Times are the minimum of --repeat runs, in seconds. Memory peaks are
+measured with tracemalloc, which is not available on Python 2.
+
+Wire benchmarks compare bytes on the wire of reads and writes with and
+without gzip. Their wall times include compression, and transfer times
+are estimated from --bandwidth_kbps.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import copy
+import json
+import platform
+import sys
+import time
+
+from future.moves.urllib import parse
+import gflags
+import httplib2
+
+import hyou.client
+import hyou.transport
+import hyou.util
+
+import http_mocks
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+FLAGS = gflags.FLAGS
+
+gflags.DEFINE_list(
+    'sizes', ['1000', '10000', '100000', '1000000'],
+    'Numbers of cells of benchmarked worksheets.')
+gflags.DEFINE_integer('cols', 20, 'Number of columns of worksheets.')
+gflags.DEFINE_integer('repeat', 3, 'Number of runs of each benchmark.')
+gflags.DEFINE_list(
+    'wire_sizes', ['100000'],
+    'Numbers of cells of worksheets used in wire benchmarks.')
+gflags.DEFINE_integer(
+    'bandwidth_kbps', 1000,
+    'Link bandwidth used to estimate transfer times in wire benchmarks.')
+gflags.DEFINE_string('output', None, 'Path to write results to.')
+
+SPREADSHEET_KEY = 'benchmark'
+
+
+def make_cell_value(row, col):
+    if col % 2 == 0:
+        return '%d' % (row * 1000 + col)
+    return 'cell-%d-%d' % (row, col)
+
+
+class SyntheticHttp(object):
+    """Serves generated responses for a spreadsheet with one worksheet.
+
+    Discovery documents are served from test records. If |gzip| is True,
+    responses are compressed when requested, and compressed requests are
+    accepted, like real servers. Compressed responses are decompressed
+    here as httplib2 does.
+    """
+
+    def __init__(self, rows, cols, gzip=False):
+        self._rows = rows
+        self._cols = cols
+        self._gzip = gzip
+        self._values_cache = {}
+        self._compressed_cache = {}
+        self.request_sizes = []
+        self.response_sizes = []
+
+    def make_entry(self):
+        return {
+            'spreadsheetId': SPREADSHEET_KEY,
+            'properties': {'title': 'Benchmark'},
+            'sheets': [{
+                'properties': {
+                    'sheetId': 0,
+                    'title': 'Sheet1',
+                    'index': 0,
+                    'gridProperties': {
+                        'rowCount': self._rows,
+                        'columnCount': self._cols,
+                    },
+                },
+            }],
+        }
+
+    def request(self, uri, method='GET', body=None, headers=None,
+                *args, **kwargs):
+        path = parse.unquote(parse.urlparse(uri).path)
+        if 'discovery' in path:
+            return http_mocks.ReplayHttp.get_instance().request(
+                uri, method, body, headers, *args, **kwargs)
+        headers = dict(
+            (name.lower(), value) for name, value in (headers or {}).items())
+        self.request_sizes.append(len(body) if body else 0)
+        if headers.get('content-encoding') == 'gzip':
+            body = hyou.transport.gzip_decompress(body)
+        if method == 'GET' and '/values/' in path:
+            content = self._get_values(path.rsplit('/values/', 1)[1])
+        elif method == 'GET':
+            content = json.dumps(self.make_entry()).encode('utf-8')
+        else:
+            content = json.dumps(
+                {'spreadsheetId': SPREADSHEET_KEY}).encode('utf-8')
+        if self._gzip and 'gzip' in headers.get('accept-encoding', ''):
+            compressed = self._compressed_cache.get(content)
+            if compressed is None:
+                compressed = hyou.transport.gzip_compress(content)
+                self._compressed_cache[content] = compressed
+            self.response_sizes.append(len(compressed))
+            content = hyou.transport.gzip_decompress(compressed)
+        else:
+            self.response_sizes.append(len(content))
+        return httplib2.Response({'status': 200}), content
+
+    def _get_values(self, range_str):
+        content = self._values_cache.get(range_str)
+        if content is None:
+            _, start_row, end_row, start_col, end_col = (
+                hyou.util.parse_range_a1_notation(range_str))
+            values = [
+                [make_cell_value(row, col)
+                 for col in range(start_col, end_col)]
+                for row in range(start_row, end_row)]
+            content = json.dumps({
+                'range': range_str,
+                'majorDimension': 'ROWS',
+                'values': values,
+            }).encode('utf-8')
+            self._values_cache[range_str] = content
+        return content
+
+
+def measure(setup, repeat):
+    """Returns the minimum time and the peak memory usage of a benchmark.
+
+    |setup| is called before each run, and returns a function to measure.
+    Memory is measured in a separate run as tracing slows down execution.
+    """
+    best_time = None
+    for _ in range(repeat):
+        func = setup()
+        start_time = time.time()
+        func()
+        elapsed = time.time() - start_time
+        if best_time is None or elapsed < best_time:
+            best_time = elapsed
+    peak_bytes = None
+    if tracemalloc:
+        func = setup()
+        tracemalloc.start()
+        try:
+            func()
+            peak_bytes = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best_time, peak_bytes
+
+
+def benchmark_size(cells, cols, repeat):
+    rows = max(1, cells // cols)
+    http = SyntheticHttp(rows, cols)
+    api = hyou.client.API(http)
+    entry = http.make_entry()
+    spreadsheet = hyou.client.Spreadsheet(api, copy.deepcopy(entry))
+
+    def new_worksheet():
+        return hyou.client.Worksheet(
+            spreadsheet, api, copy.deepcopy(entry['sheets'][0]))
+
+    def fetched_worksheet():
+        worksheet = new_worksheet()
+        worksheet._ensure_cells_fetched()
+        return worksheet
+
+    # Each setup function returns a function to be measured.
+    def construct():
+        return new_worksheet
+
+    def fetch():
+        worksheet = new_worksheet()
+        # Warm the transport so generating responses is not measured.
+        http._get_values(
+            hyou.util.format_range_a1_notation('Sheet1', 0, rows, 0, cols))
+        return worksheet._ensure_cells_fetched
+
+    def iterate():
+        worksheet = fetched_worksheet()
+
+        def run():
+            for row in worksheet:
+                for _ in row:
+                    pass
+        return run
+
+    def setitem():
+        worksheet = fetched_worksheet()
+
+        def run():
+            for i, row in enumerate(worksheet):
+                for j in range(cols):
+                    row[j] = i + j
+        return run
+
+    def commit():
+        worksheet = fetched_worksheet()
+        for i, row in enumerate(worksheet):
+            for j in range(cols):
+                row[j] = i + j
+        return worksheet.commit
+
+    result = {'cells': rows * cols, 'rows': rows, 'cols': cols}
+    result['construct_seconds'], result['construct_peak_bytes'] = measure(
+        construct, repeat)
+    result['fetch_seconds'], result['fetch_peak_bytes'] = measure(
+        fetch, repeat)
+    result['iterate_seconds'], _ = measure(iterate, repeat)
+    setitem_seconds, _ = measure(setitem, repeat)
+    result['setitem_seconds'] = setitem_seconds
+    result['setitem_cells_per_second'] = (
+        rows * cols / setitem_seconds if setitem_seconds else None)
+    result['commit_seconds'], result['commit_peak_bytes'] = measure(
+        commit, repeat)
+    result['commit_body_bytes'] = http.request_sizes[-1]
+    return result
+
+
+def benchmark_wire(cells, cols, repeat, gzip):
+    rows = max(1, cells // cols)
+    http = SyntheticHttp(rows, cols, gzip=gzip)
+    api = hyou.client.API(http, compress_threshold=0 if gzip else None)
+    entry = http.make_entry()
+    spreadsheet = hyou.client.Spreadsheet(api, copy.deepcopy(entry))
+
+    def new_worksheet():
+        return hyou.client.Worksheet(
+            spreadsheet, api, copy.deepcopy(entry['sheets'][0]))
+
+    def read():
+        return new_worksheet()._ensure_cells_fetched
+
+    def write():
+        worksheet = new_worksheet()
+        worksheet._ensure_cells_fetched()
+        for i, row in enumerate(worksheet):
+            for j in range(cols):
+                row[j] = make_cell_value(i, j + 1)
+        return worksheet.commit
+
+    def transfer_seconds(num_bytes):
+        return num_bytes * 8 / (FLAGS.bandwidth_kbps * 1000)
+
+    result = {'cells': rows * cols, 'gzip': gzip}
+    result['read_seconds'], _ = measure(read, repeat)
+    result['read_response_bytes'] = http.response_sizes[-1]
+    result['read_transfer_seconds'] = transfer_seconds(
+        result['read_response_bytes'])
+    result['write_seconds'], _ = measure(write, repeat)
+    result['write_request_bytes'] = http.request_sizes[-1]
+    result['write_transfer_seconds'] = transfer_seconds(
+        result['write_request_bytes'])
+    return result
+
+
+def main(argv):
+    results = []
+    for cells in FLAGS.sizes:
+        result = benchmark_size(int(cells), FLAGS.cols, FLAGS.repeat)
+        print('%(cells)d cells: fetch %(fetch_seconds).3fs, '
+              'commit %(commit_seconds).3fs' % result, file=sys.stderr)
+        results.append(result)
+    wire_results = []
+    for cells in FLAGS.wire_sizes:
+        for gzip in (False, True):
+            result = benchmark_wire(int(cells), FLAGS.cols, FLAGS.repeat, gzip)
+            print('%(cells)d cells, gzip=%(gzip)s: '
+                  'read %(read_response_bytes)d bytes, '
+                  'write %(write_request_bytes)d bytes' % result,
+                  file=sys.stderr)
+            wire_results.append(result)
+    report = {
+        'python': platform.python_version(),
+        'time': time.time(),
+        'bandwidth_kbps': FLAGS.bandwidth_kbps,
+        'results': results,
+        'wire_results': wire_results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if FLAGS.output:
+        with open(FLAGS.output, 'w') as f:
+            f.write(str(text) + '\n')
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    sys.exit(main(FLAGS(sys.argv)))
@@ -0,0 +1,92 @@
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import hyou.cache
+import hyou.client
+
+import http_mocks
+
+
+SPREADSHEET_KEY = '1OB50n5vs3ZaLKgQ_BHkD7AGkNDMICo3jPXPQ8Y1_ekc'
+
+
+class SqliteCellCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.cache_path = os.path.join(self.temp_dir, 'cache.sqlite')
+        self.cache = hyou.cache.SqliteCellCache(self.cache_path)
+        self.updated = datetime.datetime(2017, 2, 3, 1, 25, 31, 49000)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.temp_dir)
+
+    def test_get_put(self):
+        self.assertIsNone(
+            self.cache.get('key', 0, (0, 2, 0, 5), self.updated))
+        self.cache.put('key', 0, (0, 2, 0, 5), self.updated, [['a', 'b']])
+        self.assertEqual(
+            [['a', 'b']],
+            self.cache.get('key', 0, (0, 2, 0, 5), self.updated))
+        # Different ranges and sheets are cached separately.
+        self.assertIsNone(
+            self.cache.get('key', 0, (0, 1, 0, 5), self.updated))
+        self.assertIsNone(
+            self.cache.get('key', 1, (0, 2, 0, 5), self.updated))
+        # Stale entries are not returned.
+        self.assertIsNone(
+            self.cache.get(
+                'key', 0, (0, 2, 0, 5),
+                self.updated + datetime.timedelta(seconds=1)))
+
+    def test_persistent(self):
+        self.cache.put('key', 0, (0, 2, 0, 5), self.updated, [['a', 'b']])
+        other_cache = hyou.cache.SqliteCellCache(self.cache_path)
+        try:
+            self.assertEqual(
+                [['a', 'b']],
+                other_cache.get('key', 0, (0, 2, 0, 5), self.updated))
+        finally:
+            other_cache.close()
+
+    def test_worksheet(self):
+        api = hyou.client.API(
+            http_mocks.ReplayHttp.get_instance(), cell_cache=self.cache)
+        worksheet = hyou.client.Collection(api)[SPREADSHEET_KEY]['Sheet1']
+        self.assertEqual('honoka', worksheet[0][0])
+        self.assertEqual(
+            [['honoka', 'eri', 'kotori', 'umi', 'rin'],
+             ['maki', 'nozomi', 'hanayo', 'niko']],
+            self.cache.get(
+                SPREADSHEET_KEY, worksheet.key, (0, 2, 0, 5), self.updated))
+
+        # Cached values are served on warm start.
+        self.cache.put(
+            SPREADSHEET_KEY, worksheet.key, (0, 2, 0, 5), self.updated,
+            [['yukiho']])
+        worksheet = hyou.client.Collection(api)[SPREADSHEET_KEY]['Sheet1']
+        self.assertEqual('yukiho', worksheet[0][0])
@@ -21,6 +21,7 @@ from builtins import (  # noqa: F401
 import unittest
 
 import hyou.client
+import mock
 
 import http_mocks
 
@@ -88,5 +89,74 @@ class CollectionTest(unittest.TestCase):
             self.collection['1OB50n5vs3ZaLKgQ_BHkD7AGkNDMICo3jPXPQ8Y1_ekc']
             .key)
 
+
+class MockedCollectionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = mock.Mock()
+        self.api.cell_cache = None
+        self.spreadsheets_api = self.api.sheets.spreadsheets.return_value
+        self.collection = hyou.client.Collection(self.api)
+
     def test_create_spreadsheet(self):
-        self.collection.create_spreadsheet('Cinnamon', rows=2, cols=8)
+        create = self.spreadsheets_api.create
+        create.return_value.execute.return_value = {
+            'spreadsheetId': 'key',
+            'properties': {'title': 'Cinnamon'},
+            'sheets': [{
+                'properties': {
+                    'sheetId': 0,
+                    'title': 'Sheet1',
+                    'index': 0,
+                    'gridProperties': {'rowCount': 2, 'columnCount': 8},
+                },
+            }],
+        }
+        spreadsheet = self.collection.create_spreadsheet(
+            'Cinnamon', rows=2, cols=8, data=[['a', 1, '=A1', '2.5']])
+        create.assert_called_once_with(body={
+            'properties': {'title': 'Cinnamon'},
+            'sheets': [{
+                'properties': {
+                    'gridProperties': {'rowCount': 2, 'columnCount': 8},
+                },
+                'data': [{
+                    'startRow': 0,
+                    'startColumn': 0,
+                    'rowData': [{
+                        'values': [
+                            {'userEnteredValue': {'stringValue': 'a'}},
+                            {'userEnteredValue': {'numberValue': 1}},
+                            {'userEnteredValue': {'formulaValue': '=A1'}},
+                            {'userEnteredValue': {'numberValue': 2.5}},
+                        ],
+                    }],
+                }],
+            }],
+        })
+        self.assertEqual('key', spreadsheet.key)
+        self.assertEqual('Cinnamon', spreadsheet.title)
+        self.assertEqual((2, 8), (spreadsheet[0].rows, spreadsheet[0].cols))
+        # The new spreadsheet is cached without extra requests.
+        self.assertIs(spreadsheet, self.collection['key'])
+        self.spreadsheets_api.get.assert_not_called()
+        self.api.drive.files.assert_not_called()
+
+    def test_create_spreadsheet_worksheets(self):
+        create = self.spreadsheets_api.create
+        create.return_value.execute.return_value = {
+            'spreadsheetId': 'key',
+            'properties': {'title': 'Cinnamon'},
+            'sheets': [],
+        }
+        self.collection.create_spreadsheet(
+            'Cinnamon', worksheets=[('A', 1, 2), ('B', 3, 4, [['x']])])
+        sheets = create.call_args[1]['body']['sheets']
+        self.assertEqual(
+            [{'title': 'A',
+              'gridProperties': {'rowCount': 1, 'columnCount': 2}},
+             {'title': 'B',
+              'gridProperties': {'rowCount': 3, 'columnCount': 4}}],
+            [sheet['properties'] for sheet in sheets])
+        self.assertNotIn('data', sheets[0])
+        self.assertIn('data', sheets[1])
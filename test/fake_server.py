@@ -0,0 +1,655 @@
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process fake of Sheets v4 and Drive v2 APIs.
+
+FakeServer keeps spreadsheets in memory and can be passed to
+hyou.client.API() in place of an httplib2.Http object. It is thread-safe,
+so one instance can be shared by concurrent clients. Latency, server
+errors and 429 quota errors can be injected.
+
+Only the subset of the APIs used by hyou is implemented. Values are
+stored as entered; formulas are not evaluated.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import collections
+import copy
+import datetime
+import json
+import random
+import re
+import threading
+import time
+
+from future.moves.urllib import parse
+import httplib2
+
+import hyou.transport
+import hyou.util
+
+import http_mocks
+
+
+class FakeError(Exception):
+
+    def __init__(self, status, message, reason):
+        super(FakeError, self).__init__(message)
+        self.status = status
+        self.message = message
+        self.reason = reason
+
+
+def _bad_request(message):
+    return FakeError(400, message, 'INVALID_ARGUMENT')
+
+
+def _not_found(message):
+    return FakeError(404, message, 'NOT_FOUND')
+
+
+_ROUTES = [
+    ('POST', r'/v4/spreadsheets', '_create'),
+    ('GET', r'/v4/spreadsheets/([^/:]+)', '_get'),
+    ('POST', r'/v4/spreadsheets/([^/:]+):batchUpdate', '_batch_update'),
+    ('POST', r'/v4/spreadsheets/([^/:]+)/sheets/([^/:]+):copyTo',
+     '_copy_sheet_to'),
+    ('GET', r'/v4/spreadsheets/([^/:]+)/values:batchGet',
+     '_values_batch_get'),
+    ('POST', r'/v4/spreadsheets/([^/:]+)/values:batchUpdate',
+     '_values_batch_update'),
+    ('POST', r'/v4/spreadsheets/([^/:]+)/values:batchClear',
+     '_values_batch_clear'),
+    ('GET', r'/v4/spreadsheets/([^/:]+)/values/([^/:]+)', '_values_get'),
+    ('PUT', r'/v4/spreadsheets/([^/:]+)/values/([^/:]+)', '_values_update'),
+    ('POST', r'/v4/spreadsheets/([^/:]+)/values/([^/:]+):append',
+     '_values_append'),
+    ('POST', r'/v4/spreadsheets/([^/:]+)/values/([^/:]+):clear',
+     '_values_clear'),
+    ('GET', r'/drive/v2/files', '_drive_list'),
+    ('POST', r'/drive/v2/files', '_drive_insert'),
+    ('GET', r'/drive/v2/files/([^/]+)', '_drive_get'),
+]
+_ROUTES = [
+    (method, re.compile('^%s$' % pattern), handler)
+    for method, pattern, handler in _ROUTES]
+
+
+class FakeServer(object):
+    """A fake of Sheets v4 and Drive v2 APIs, usable as an http object.
+
+    |latency| is seconds to wait per request, or a function returning it.
+    Requests fail with status 503 at probability |error_rate|. If |quota| is
+    given as (max_requests, seconds), requests exceeding it in a sliding
+    window fail with status 429. If |max_cells| is given, resizing a sheet
+    beyond that many cells fails with status 400.
+    """
+
+    def __init__(self, latency=0, error_rate=0, quota=None, seed=None,
+                 max_cells=None):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.quota = quota
+        self.max_cells = max_cells
+        self.requests = []
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._spreadsheets = collections.OrderedDict()
+        self._queued_errors = []
+        self._request_times = collections.deque()
+        self._next_id = 1
+
+    def queue_errors(self, *statuses):
+        """Makes next requests fail with |statuses|.
+
+        A status of None lets the corresponding request through.
+        """
+        with self._lock:
+            self._queued_errors.extend(statuses)
+
+    def add_spreadsheet(self, title, worksheets=(('Sheet1', 1000, 26),)):
+        """Adds a spreadsheet, and returns its key.
+
+        |worksheets| is a list of (title, rows, cols) or
+        (title, rows, cols, values).
+        """
+        with self._lock:
+            spreadsheet = self._new_spreadsheet(title)
+            for worksheet in worksheets:
+                sheet = self._add_sheet(spreadsheet, {
+                    'title': worksheet[0],
+                    'gridProperties': {
+                        'rowCount': worksheet[1],
+                        'columnCount': worksheet[2],
+                    },
+                })
+                if len(worksheet) > 3:
+                    self._write_values(sheet, 0, 0, worksheet[3])
+            return spreadsheet['spreadsheetId']
+
+    def get_values(self, key, title):
+        """Returns all values of a worksheet as a list of lists."""
+        with self._lock:
+            sheet = self._find_sheet_by_title(self._find(key), title)
+            grid = sheet['properties']['gridProperties']
+            return self._read_values(
+                sheet, 0, grid['rowCount'], 0, grid['columnCount'])
+
+    def request(self, uri, method='GET', body=None, headers=None,
+                *args, **kwargs):
+        _, _, path, _, query, _ = parse.urlparse(uri)
+        if 'discovery' in path:
+            return http_mocks.ReplayHttp.get_instance().request(
+                uri, method, body, headers, *args, **kwargs)
+        headers = dict(
+            (name.lower(), value) for name, value in (headers or {}).items())
+        if headers.get('content-encoding') == 'gzip':
+            body = hyou.transport.gzip_decompress(body)
+        with self._lock:
+            self.requests.append((method, uri))
+            error = self._pick_error()
+        latency = self.latency() if callable(self.latency) else self.latency
+        if latency:
+            time.sleep(latency)
+        try:
+            if error:
+                raise error
+            params = parse.parse_qs(query)
+            if isinstance(body, bytes):
+                body = body.decode('utf-8')
+            data = json.loads(body) if body else {}
+            with self._lock:
+                result = self._dispatch(method, path, params, data)
+            status = 200
+        except FakeError as e:
+            status = e.status
+            result = {
+                'error': {
+                    'code': e.status,
+                    'message': e.message,
+                    'status': e.reason,
+                },
+            }
+        response = httplib2.Response({
+            'status': status,
+            'content-type': 'application/json; charset=UTF-8',
+        })
+        return response, json.dumps(result).encode('utf-8')
+
+    def _pick_error(self):
+        if self._queued_errors:
+            status = self._queued_errors.pop(0)
+            if status is not None:
+                return FakeError(status, 'Injected error', 'UNAVAILABLE')
+        if self.quota:
+            max_requests, seconds = self.quota
+            now = time.time()
+            while (self._request_times and
+                   self._request_times[0] <= now - seconds):
+                self._request_times.popleft()
+            if len(self._request_times) >= max_requests:
+                return FakeError(
+                    429, 'Quota exceeded', 'RESOURCE_EXHAUSTED')
+            self._request_times.append(now)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return FakeError(503, 'The service is unavailable', 'UNAVAILABLE')
+        return None
+
+    def _dispatch(self, method, path, params, data):
+        for route_method, pattern, handler in _ROUTES:
+            m = pattern.match(path)
+            if m and method == route_method:
+                args = [parse.unquote(group) for group in m.groups()]
+                return getattr(self, handler)(params, data, *args)
+        raise _not_found('No such method: %s %s' % (method, path))
+
+    # Storage.
+
+    def _new_spreadsheet(self, title):
+        key = 'fake%08d' % self._next_id
+        self._next_id += 1
+        spreadsheet = {
+            'spreadsheetId': key,
+            'properties': {'title': title},
+            'sheets': [],
+            'next_sheet_id': 0,
+            'modified': datetime.datetime.utcnow(),
+        }
+        self._spreadsheets[key] = spreadsheet
+        return spreadsheet
+
+    def _find(self, key):
+        spreadsheet = self._spreadsheets.get(key)
+        if spreadsheet is None:
+            raise _not_found('Requested entity was not found.')
+        return spreadsheet
+
+    def _touch(self, spreadsheet):
+        spreadsheet['modified'] = max(
+            datetime.datetime.utcnow(),
+            spreadsheet['modified'] + datetime.timedelta(milliseconds=1))
+
+    def _add_sheet(self, spreadsheet, properties):
+        properties = copy.deepcopy(properties)
+        properties.setdefault('sheetId', spreadsheet['next_sheet_id'])
+        properties.setdefault(
+            'title', 'Sheet%d' % (len(spreadsheet['sheets']) + 1))
+        properties['index'] = len(spreadsheet['sheets'])
+        properties['sheetType'] = 'GRID'
+        grid = properties.setdefault('gridProperties', {})
+        grid.setdefault('rowCount', 1000)
+        grid.setdefault('columnCount', 26)
+        spreadsheet['next_sheet_id'] = max(
+            spreadsheet['next_sheet_id'], properties['sheetId'] + 1)
+        sheet = {'properties': properties, 'cells': {}}
+        spreadsheet['sheets'].append(sheet)
+        return sheet
+
+    def _find_sheet(self, spreadsheet, sheet_id):
+        for sheet in spreadsheet['sheets']:
+            if sheet['properties']['sheetId'] == sheet_id:
+                return sheet
+        raise _bad_request('No grid with id: %s' % sheet_id)
+
+    def _find_sheet_by_title(self, spreadsheet, title):
+        for sheet in spreadsheet['sheets']:
+            if sheet['properties']['title'] == title:
+                return sheet
+        raise _bad_request('Unable to parse range: %s' % title)
+
+    def _resolve_range(self, spreadsheet, range_str):
+        try:
+            title, cell_range = (
+                hyou.util.parse_worksheet_range_a1_notation(range_str))
+        except ValueError:
+            raise _bad_request('Unable to parse range: %s' % range_str)
+        sheet = self._find_sheet_by_title(spreadsheet, title)
+        grid = sheet['properties']['gridProperties']
+        start_row, end_row, start_col, end_col = (
+            cell_range or (0, None, 0, None))
+        if end_row is None:
+            end_row = grid['rowCount']
+        if end_col is None:
+            end_col = grid['columnCount']
+        self._check_grid_limits(sheet, end_row, end_col)
+        return (sheet, start_row, end_row, start_col, end_col)
+
+    def _check_grid_limits(self, sheet, end_row, end_col):
+        grid = sheet['properties']['gridProperties']
+        if end_row > grid['rowCount'] or end_col > grid['columnCount']:
+            raise _bad_request('Range exceeds grid limits.')
+
+    def _read_values(self, sheet, start_row, end_row, start_col, end_col):
+        cells = sheet['cells']
+        values = []
+        for row in range(start_row, end_row):
+            row_values = [
+                cells.get((row, col), '') for col in range(start_col, end_col)]
+            while row_values and row_values[-1] == '':
+                row_values.pop()
+            values.append(row_values)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def _write_values(self, sheet, start_row, start_col, values):
+        self._check_grid_limits(
+            sheet, start_row + len(values),
+            start_col + max([len(row) for row in values] or [0]))
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                self._set_cell(sheet, start_row + i, start_col + j, value)
+        return sum(len(row) for row in values)
+
+    def _set_cell(self, sheet, row, col, value):
+        if value is None or value == '':
+            sheet['cells'].pop((row, col), None)
+        else:
+            sheet['cells'][(row, col)] = hyou.util.format_cell_value(value)
+
+    def _shift_cells(self, sheet, axis, at, delta):
+        cells = {}
+        for key, value in sheet['cells'].items():
+            index = hyou.util.shift_index(key[axis], at, delta)
+            if index is not None:
+                key = (index, key[1]) if axis == 0 else (key[0], index)
+                cells[key] = value
+        sheet['cells'] = cells
+
+    def _resize(self, sheet, rows, cols):
+        if self.max_cells is not None and rows * cols > self.max_cells:
+            raise _bad_request(
+                'This action would increase the number of cells in the '
+                'workbook above the limit of %d cells.' % self.max_cells)
+        grid = sheet['properties']['gridProperties']
+        grid['rowCount'] = rows
+        grid['columnCount'] = cols
+        sheet['cells'] = dict(
+            (key, value) for key, value in sheet['cells'].items()
+            if key[0] < rows and key[1] < cols)
+
+    def _render(self, spreadsheet):
+        return {
+            'spreadsheetId': spreadsheet['spreadsheetId'],
+            'properties': copy.deepcopy(spreadsheet['properties']),
+            'sheets': [
+                {'properties': copy.deepcopy(sheet['properties'])}
+                for sheet in spreadsheet['sheets']],
+            'spreadsheetUrl': (
+                'https://docs.google.com/spreadsheets/d/%s/edit' %
+                spreadsheet['spreadsheetId']),
+        }
+
+    def _render_file(self, spreadsheet):
+        return {
+            'id': spreadsheet['spreadsheetId'],
+            'title': spreadsheet['properties']['title'],
+            'mimeType': 'application/vnd.google-apps.spreadsheet',
+            'modifiedDate': spreadsheet['modified'].strftime(
+                '%Y-%m-%dT%H:%M:%S.') + '%03dZ' % (
+                    spreadsheet['modified'].microsecond // 1000),
+        }
+
+    # Sheets API: spreadsheets.
+
+    def _create(self, params, data):
+        spreadsheet = self._new_spreadsheet(
+            data.get('properties', {}).get('title', 'Untitled spreadsheet'))
+        for sheet_data in data.get('sheets') or [{}]:
+            sheet = self._add_sheet(
+                spreadsheet, sheet_data.get('properties', {}))
+            for grid_data in sheet_data.get('data', []):
+                self._update_cells(
+                    sheet, grid_data.get('startRow', 0),
+                    grid_data.get('startColumn', 0),
+                    grid_data.get('rowData', []))
+        return self._render(spreadsheet)
+
+    def _get(self, params, data, key):
+        spreadsheet = self._find(key)
+        result = self._render(spreadsheet)
+        if params.get('includeGridData') != ['true']:
+            return result
+        # Fields masks are not supported; grid data only have values.
+        sheet_ranges = collections.defaultdict(list)
+        if params.get('ranges'):
+            for range_str in params['ranges']:
+                sheet, start_row, end_row, start_col, end_col = (
+                    self._resolve_range(spreadsheet, range_str))
+                sheet_ranges[sheet['properties']['sheetId']].append(
+                    (start_row, end_row, start_col, end_col))
+        else:
+            for sheet in spreadsheet['sheets']:
+                grid = sheet['properties']['gridProperties']
+                sheet_ranges[sheet['properties']['sheetId']].append(
+                    (0, grid['rowCount'], 0, grid['columnCount']))
+        for sheet, sheet_entry in zip(spreadsheet['sheets'], result['sheets']):
+            cell_ranges = sheet_ranges[sheet['properties']['sheetId']]
+            if cell_ranges:
+                sheet_entry['data'] = [
+                    self._render_grid_data(sheet, *cell_range)
+                    for cell_range in cell_ranges]
+        return result
+
+    def _render_grid_data(self, sheet, start_row, end_row, start_col, end_col):
+        values = self._read_values(
+            sheet, start_row, end_row, start_col, end_col)
+        grid_data = {
+            'rowData': [
+                {'values': [
+                    {'formattedValue': value} if value else {}
+                    for value in row]}
+                for row in values],
+        }
+        # Like the real server, zero indices are omitted.
+        if start_row:
+            grid_data['startRow'] = start_row
+        if start_col:
+            grid_data['startColumn'] = start_col
+        return grid_data
+
+    def _batch_update(self, params, data, key):
+        spreadsheet = self._find(key)
+        replies = []
+        for request in data.get('requests', []):
+            (kind, args), = request.items()
+            handler = getattr(self, '_request_%s' % kind, None)
+            if handler is None:
+                raise _bad_request('Unsupported request: %s' % kind)
+            replies.append(handler(spreadsheet, args) or {})
+        self._touch(spreadsheet)
+        result = {'spreadsheetId': key, 'replies': replies}
+        if data.get('include_spreadsheet_in_response') or data.get(
+                'includeSpreadsheetInResponse'):
+            result['updatedSpreadsheet'] = self._render(spreadsheet)
+        return result
+
+    def _copy_sheet_to(self, params, data, key, sheet_id):
+        sheet = self._find_sheet(self._find(key), int(sheet_id))
+        dest_spreadsheet = self._find(data['destinationSpreadsheetId'])
+        properties = copy.deepcopy(sheet['properties'])
+        del properties['sheetId']
+        properties['title'] = 'Copy of %s' % properties['title']
+        new_sheet = self._add_sheet(dest_spreadsheet, properties)
+        new_sheet['cells'] = dict(sheet['cells'])
+        self._touch(dest_spreadsheet)
+        return copy.deepcopy(new_sheet['properties'])
+
+    def _request_addSheet(self, spreadsheet, args):
+        sheet = self._add_sheet(spreadsheet, args.get('properties', {}))
+        return {'addSheet': {'properties': copy.deepcopy(sheet['properties'])}}
+
+    def _request_deleteSheet(self, spreadsheet, args):
+        sheet = self._find_sheet(spreadsheet, args['sheetId'])
+        spreadsheet['sheets'].remove(sheet)
+        for index, sheet in enumerate(spreadsheet['sheets']):
+            sheet['properties']['index'] = index
+
+    def _request_updateSpreadsheetProperties(self, spreadsheet, args):
+        spreadsheet['properties'].update(args['properties'])
+
+    def _request_updateSheetProperties(self, spreadsheet, args):
+        properties = args['properties']
+        sheet = self._find_sheet(spreadsheet, properties['sheetId'])
+        if 'title' in properties:
+            sheet['properties']['title'] = properties['title']
+        if 'gridProperties' in properties:
+            grid = dict(sheet['properties']['gridProperties'])
+            grid.update(properties['gridProperties'])
+            self._resize(sheet, grid['rowCount'], grid['columnCount'])
+
+    def _request_appendDimension(self, spreadsheet, args):
+        sheet = self._find_sheet(spreadsheet, args['sheetId'])
+        grid = sheet['properties']['gridProperties']
+        if args['dimension'] == 'ROWS':
+            self._resize(sheet, grid['rowCount'] + args['length'],
+                         grid['columnCount'])
+        else:
+            self._resize(sheet, grid['rowCount'],
+                         grid['columnCount'] + args['length'])
+
+    def _request_insertDimension(self, spreadsheet, args):
+        self._change_dimension(spreadsheet, args['range'], insert=True)
+
+    def _request_deleteDimension(self, spreadsheet, args):
+        self._change_dimension(spreadsheet, args['range'], insert=False)
+
+    def _change_dimension(self, spreadsheet, dimension_range, insert):
+        sheet = self._find_sheet(spreadsheet, dimension_range['sheetId'])
+        grid = sheet['properties']['gridProperties']
+        axis = 0 if dimension_range['dimension'] == 'ROWS' else 1
+        key = 'rowCount' if axis == 0 else 'columnCount'
+        start = dimension_range['startIndex']
+        end = dimension_range['endIndex']
+        if not (0 <= start < end and start <= grid[key]):
+            raise _bad_request('Invalid dimension range.')
+        if not insert and end > grid[key]:
+            raise _bad_request('Invalid dimension range.')
+        delta = end - start if insert else start - end
+        self._shift_cells(sheet, axis, start, delta)
+        grid[key] += delta
+
+    def _request_copyPaste(self, spreadsheet, args):
+        source = args['source']
+        source_sheet = self._find_sheet(spreadsheet, source['sheetId'])
+        destination = args['destination']
+        dest_sheet = self._find_sheet(spreadsheet, destination['sheetId'])
+        values = [
+            [source_sheet['cells'].get((row, col), '')
+             for col in range(source['startColumnIndex'],
+                              source['endColumnIndex'])]
+            for row in range(source['startRowIndex'], source['endRowIndex'])]
+        self._write_values(
+            dest_sheet, destination['startRowIndex'],
+            destination['startColumnIndex'], values)
+
+    def _request_updateCells(self, spreadsheet, args):
+        start = args['start']
+        sheet = self._find_sheet(spreadsheet, start['sheetId'])
+        self._update_cells(
+            sheet, start.get('rowIndex', 0), start.get('columnIndex', 0),
+            args.get('rows', []))
+
+    def _request_pasteData(self, spreadsheet, args):
+        coordinate = args['coordinate']
+        sheet = self._find_sheet(spreadsheet, coordinate['sheetId'])
+        self._write_values(
+            sheet, coordinate.get('rowIndex', 0),
+            coordinate.get('columnIndex', 0),
+            hyou.util.parse_delimited(args['data'], args['delimiter']))
+
+    def _update_cells(self, sheet, start_row, start_col, row_data):
+        values = []
+        for row in row_data:
+            row_values = []
+            for cell in row.get('values', []):
+                value = cell.get('userEnteredValue', {})
+                if 'numberValue' in value:
+                    number = value['numberValue']
+                    if number == int(number):
+                        number = int(number)
+                    row_values.append('%s' % number)
+                elif 'boolValue' in value:
+                    row_values.append(
+                        'TRUE' if value['boolValue'] else 'FALSE')
+                else:
+                    row_values.append(
+                        value.get('stringValue', value.get('formulaValue')))
+            values.append(row_values)
+        self._write_values(sheet, start_row, start_col, values)
+
+    # Sheets API: spreadsheets.values.
+
+    def _value_range(self, range_str, values):
+        value_range = {'range': range_str, 'majorDimension': 'ROWS'}
+        if values:
+            value_range['values'] = values
+        return value_range
+
+    def _values_get(self, params, data, key, range_str):
+        sheet, start_row, end_row, start_col, end_col = self._resolve_range(
+            self._find(key), range_str)
+        return self._value_range(range_str, self._read_values(
+            sheet, start_row, end_row, start_col, end_col))
+
+    def _values_batch_get(self, params, data, key):
+        spreadsheet = self._find(key)
+        value_ranges = []
+        for range_str in params.get('ranges', []):
+            sheet, start_row, end_row, start_col, end_col = (
+                self._resolve_range(spreadsheet, range_str))
+            value_ranges.append(self._value_range(range_str, self._read_values(
+                sheet, start_row, end_row, start_col, end_col)))
+        return {'spreadsheetId': key, 'valueRanges': value_ranges}
+
+    def _values_update(self, params, data, key, range_str):
+        spreadsheet = self._find(key)
+        sheet, start_row, _, start_col, _ = self._resolve_range(
+            spreadsheet, range_str)
+        cells = self._write_values(
+            sheet, start_row, start_col, data.get('values', []))
+        self._touch(spreadsheet)
+        return {'spreadsheetId': key, 'updatedCells': cells}
+
+    def _values_batch_update(self, params, data, key):
+        spreadsheet = self._find(key)
+        total_cells = 0
+        for value_range in data.get('data', []):
+            sheet, start_row, _, start_col, _ = self._resolve_range(
+                spreadsheet, value_range['range'])
+            total_cells += self._write_values(
+                sheet, start_row, start_col, value_range.get('values', []))
+        self._touch(spreadsheet)
+        return {'spreadsheetId': key, 'totalUpdatedCells': total_cells}
+
+    def _values_append(self, params, data, key, range_str):
+        spreadsheet = self._find(key)
+        sheet, _, _, _, _ = self._resolve_range(spreadsheet, range_str)
+        values = data.get('values', [])
+        start_row = max([row for row, _ in sheet['cells']] or [-1]) + 1
+        self._shift_cells(sheet, 0, start_row, len(values))
+        grid = sheet['properties']['gridProperties']
+        grid['rowCount'] += len(values)
+        grid['columnCount'] = max(
+            [grid['columnCount']] + [len(row) for row in values])
+        self._write_values(sheet, start_row, 0, values)
+        self._touch(spreadsheet)
+        end_col = max([len(row) for row in values] or [1])
+        updated_range = hyou.util.format_range_a1_notation(
+            sheet['properties']['title'], start_row,
+            start_row + len(values), 0, end_col)
+        return {
+            'spreadsheetId': key,
+            'updates': {
+                'spreadsheetId': key,
+                'updatedRange': updated_range,
+                'updatedRows': len(values),
+            },
+        }
+
+    def _values_clear(self, params, data, key, range_str):
+        return self._values_batch_clear(params, {'ranges': [range_str]}, key)
+
+    def _values_batch_clear(self, params, data, key):
+        spreadsheet = self._find(key)
+        for range_str in data.get('ranges', []):
+            sheet, start_row, end_row, start_col, end_col = (
+                self._resolve_range(spreadsheet, range_str))
+            for row, col in list(sheet['cells']):
+                if start_row <= row < end_row and start_col <= col < end_col:
+                    del sheet['cells'][(row, col)]
+        self._touch(spreadsheet)
+        return {'spreadsheetId': key, 'clearedRanges': data.get('ranges')}
+
+    # Drive API.
+
+    def _drive_list(self, params, data):
+        return {
+            'items': [
+                self._render_file(spreadsheet)
+                for spreadsheet in self._spreadsheets.values()],
+        }
+
+    def _drive_get(self, params, data, key):
+        return self._render_file(self._find(key))
+
+    def _drive_insert(self, params, data):
+        spreadsheet = self._new_spreadsheet(data.get('title', 'Untitled'))
+        self._add_sheet(spreadsheet, {'title': 'Sheet1'})
+        return self._render_file(spreadsheet)
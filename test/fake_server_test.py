@@ -0,0 +1,124 @@
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import threading
+import unittest
+
+import googleapiclient.errors
+
+import hyou.client
+
+import fake_server
+
+
+class FakeServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = fake_server.FakeServer()
+        self.key = self.server.add_spreadsheet('Cinnamon', [
+            ('Sheet1', 3, 3, [['a', 'b', 'c'], ['d', 'e', 'f']]),
+        ])
+        self.collection = hyou.client.Collection(
+            hyou.client.API(self.server))
+
+    def test_read_write(self):
+        self.assertEqual([self.key], self.collection.keys())
+        worksheet = self.collection[self.key]['Sheet1']
+        self.assertEqual(['d', 'e', 'f'], list(worksheet[1]))
+        with worksheet:
+            worksheet[2][0] = 'g'
+            worksheet[0][1] = ''
+        self.assertEqual(
+            [['a', '', 'c'], ['d', 'e', 'f'], ['g']],
+            self.server.get_values(self.key, 'Sheet1'))
+
+    def test_create_and_resize(self):
+        spreadsheet = self.collection.create_spreadsheet(
+            'Kotori', rows=2, cols=2, data=[['x', 1]])
+        worksheet = spreadsheet[0]
+        view = worksheet.view(
+            start_row=2, end_row=3, end_col=3, auto_resize=True)
+        view[0][2] = 'y'
+        view.commit()
+        self.assertEqual((3, 3), (worksheet.rows, worksheet.cols))
+        self.assertEqual(
+            [['x', '1'], [], ['', '', 'y']],
+            self.server.get_values(spreadsheet.key, 'Sheet1'))
+        worksheet.insert_rows(0)
+        worksheet.delete_cols(0)
+        worksheet.refresh()
+        self.assertEqual(
+            [[], ['1'], [], ['', 'y']],
+            self.server.get_values(spreadsheet.key, 'Sheet1'))
+        self.assertEqual(
+            [['', ''], ['1', ''], ['', ''], ['', 'y']],
+            [list(row) for row in worksheet])
+
+    def test_append_and_clear(self):
+        worksheet = self.collection[self.key]['Sheet1']
+        worksheet.append_rows([['x'], ['y']])
+        self.assertEqual(5, worksheet.rows)
+        self.assertEqual(
+            [['a', 'b', 'c'], ['d', 'e', 'f'], ['x'], ['y']],
+            self.server.get_values(self.key, 'Sheet1'))
+        self.collection[self.key].clear_ranges(
+            [worksheet.view(end_row=1), worksheet.view(start_row=3)])
+        self.assertEqual(
+            [[], ['d', 'e', 'f'], ['x']],
+            self.server.get_values(self.key, 'Sheet1'))
+
+    def test_injected_errors(self):
+        self.server.queue_errors(503)
+        with self.assertRaises(googleapiclient.errors.HttpError) as cm:
+            self.collection[self.key]
+        self.assertEqual(503, cm.exception.resp.status)
+        self.collection[self.key]
+
+    def test_quota(self):
+        self.server.quota = (2, 60)
+        self.collection[self.key]['Sheet1'][0][0]
+        with self.assertRaises(googleapiclient.errors.HttpError) as cm:
+            self.collection[self.key].refresh()
+        self.assertEqual(429, cm.exception.resp.status)
+
+    def test_concurrent_clients(self):
+        self.server.latency = 0.01
+        errors = []
+
+        def worker(row):
+            try:
+                collection = hyou.client.Collection(
+                    hyou.client.API(self.server))
+                worksheet = collection[self.key]['Sheet1']
+                with worksheet.view(start_row=row, end_row=row + 1) as view:
+                    view[0][0] = 'w%d' % row
+            except Exception as e:
+                errors.append(e)
+
+        threads = [
+            threading.Thread(target=worker, args=(row,)) for row in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual([], errors)
+        self.assertEqual(
+            ['w0', 'w1', 'w2'],
+            [row[0] for row in self.server.get_values(self.key, 'Sheet1')])
@@ -24,61 +24,114 @@ import json
 import logging
 import os
 
-from future.moves.urllib import parse
-
 import hyou.util
 
 
 RECORDS_DIR = os.path.join(os.path.dirname(__file__), 'records')
+INDEX_FILENAME = 'index.json'
 
 ENV_RECORD = os.environ.get('HYOU_TEST_RECORD')
 ENV_CREDENTIALS = os.environ.get('HYOU_TEST_CREDENTIALS')
 
 
-def _canonicalize_uri(uri):
-    scheme, netloc, path, params, query, fragment = parse.urlparse(uri)
-    if query:
-        query = parse.urlencode(sorted(parse.parse_qsl(query)))
-    return parse.urlunparse((scheme, netloc, path, params, query, fragment))
-
-
-def _canonicalize_json(body_json):
-    # body_json can be bytes or str.
-    if isinstance(body_json, str):
-        json_str = body_json
-    else:
-        json_str = body_json.decode('utf-8')
-    json_data = json.loads(json_str)
-    canonicalized_json_binary = json.dumps(
-        json_data, sort_keys=True, separators=(',', ':')).encode('utf-8')
-    return canonicalized_json_binary
-
-
 def _build_signature(method, uri, body):
-    sig = '%s %s' % (method, _canonicalize_uri(uri))
+    sig = '%s %s' % (method, hyou.util.canonicalize_uri(uri))
     if body is not None:
-        sig += ' %s' % hashlib.sha1(_canonicalize_json(body)).hexdigest()
+        sig += ' %s' % hashlib.sha1(
+            hyou.util.canonicalize_json(body)).hexdigest()
     return sig
 
 
-def _load_records():
-    records = {}
-    for filename in sorted(os.listdir(RECORDS_DIR)):
-        record_path = os.path.join(RECORDS_DIR, filename)
+def _record_signature(record):
+    body_bytes = (
+        record['request'].encode('utf-8')
+        if record['request']
+        else None)
+    return _build_signature(
+        method=record['method'], uri=record['uri'], body=body_bytes)
+
+
+class RecordStore(object):
+    """Looks up records by signatures, loading record files on demand.
+
+    index.json maps signatures to record file names, so record files are not
+    parsed until they are hit. Record files missing in the index are
+    indexed on startup; run this module to update index.json.
+
+    Signatures can differ between Python versions as URI quoting differs, so
+    all record files are indexed again on the first miss.
+    """
+
+    def __init__(self, records_dir):
+        self._records_dir = records_dir
+        self._index_path = os.path.join(records_dir, INDEX_FILENAME)
+        self._records = {}
+        self._fully_indexed = False
+        index = {}
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        filenames = set(os.listdir(records_dir))
+        filenames.discard(INDEX_FILENAME)
+        self._index = dict(
+            (sig, filename) for sig, filename in index.items()
+            if filename in filenames)
+        unindexed_filenames = filenames - set(self._index.values())
+        for filename in sorted(unindexed_filenames):
+            logging.warning('Record not indexed: %s', filename)
+            self._add_to_index(filename)
+
+    def get(self, sig):
+        record = self._records.get(sig)
+        if record is None:
+            filename = self._index.get(sig)
+            if filename is None and not self._fully_indexed:
+                self._index_all()
+                filename = self._index.get(sig)
+            if filename is None:
+                return None
+            record = self._records[sig] = self._read_record(filename)
+        return record
+
+    def signatures(self):
+        if not self._fully_indexed:
+            self._index_all()
+        return sorted(self._index)
+
+    def add(self, sig, record):
+        filename = '%s.json' % hashlib.sha1(sig.encode('utf-8')).hexdigest()
+        record_path = os.path.join(self._records_dir, filename)
+        with open(record_path, 'w') as f:
+            json.dump(record, f)
+        record['_path'] = record_path
+        self._index[sig] = filename
+        self._records[sig] = record
+        self.save_index()
+        return record
+
+    def save_index(self):
+        with open(self._index_path, 'w') as f:
+            f.write(str(json.dumps(self._index, indent=0, sort_keys=True)))
+            f.write('\n')
+
+    def _index_all(self):
+        self._index = {}
+        for filename in sorted(os.listdir(self._records_dir)):
+            if filename != INDEX_FILENAME:
+                self._add_to_index(filename)
+        self._fully_indexed = True
+
+    def _add_to_index(self, filename):
+        sig = _record_signature(self._read_record(filename))
+        assert sig not in self._index, 'dup response: %s' % filename
+        self._index[sig] = filename
+
+    def _read_record(self, filename):
+        record_path = os.path.join(self._records_dir, filename)
         with open(record_path, 'r', encoding='utf-8') as f:
             record = json.load(f)
-            record['_path'] = record_path
-            body_bytes = (
-                record['request'].encode('utf-8')
-                if record['request']
-                else None)
-            sig = _build_signature(
-                method=record['method'],
-                uri=record['uri'],
-                body=body_bytes)
-            assert sig not in records, 'dup response: %s' % filename
-            records[sig] = record
-    return records
+        record['_path'] = record_path
+        return record
 
 
 def _make_ok_response():
@@ -101,13 +154,13 @@ class ReplayHttp(object):
             with open(ENV_CREDENTIALS) as f:
                 credentials = hyou.util.parse_credentials(f.read())
             self._real_http = credentials.authorize(self._real_http)
-        self._records = _load_records()
+        self._records = RecordStore(RECORDS_DIR)
 
     def request(self, uri, method='GET', body=None, *args, **kwargs):
         sig = _build_signature(method=method, uri=uri, body=body)
 
-        if sig in self._records:
-            record = self._records[sig]
+        record = self._records.get(sig)
+        if record is not None:
             logging.info('Returning a recorded response: %s', record['_path'])
             response_body = record['response'].encode('utf-8')
             return (_make_ok_response(), response_body)
@@ -115,7 +168,7 @@ class ReplayHttp(object):
         if ENV_RECORD != '1':
             logging.error('Response not available!')
             logging.error('Requested: %s', sig)
-            for s in sorted(self._records.keys()):
+            for s in self._records.signatures():
                 logging.error('Candidate: %s', s)
             raise Exception(
                 'Response not available; run unit tests with '
@@ -129,21 +182,19 @@ class ReplayHttp(object):
                 'HYOU_TEST_CREDENTIALS?\n%s'
                 % (response_headers.status, response_body))
 
-        record = {
+        record = self._records.add(sig, {
             'method': method,
             'uri': uri,
             'request': body,
             'response': response_body.decode('utf-8'),
-        }
-        sig_hash = hashlib.sha1(sig).hexdigest()
-        record_path = os.path.join(RECORDS_DIR, '%s.json' % sig_hash)
-        with open(record_path, 'w') as f:
-            json.dump(record, f)
-
-        logging.info('Recorded a response: %s', record_path)
-
-        record['_path'] = record_path
-        self._records[sig] = record
+        })
+        logging.info('Recorded a response: %s', record['_path'])
 
         # Do not return |response_headers| for consistency on replay.
         return (_make_ok_response(), response_body)
+
+
+if __name__ == '__main__':
+    store = RecordStore(RECORDS_DIR)
+    store._index_all()
+    store.save_index()
@@ -0,0 +1,169 @@
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import io
+import json
+import unittest
+
+import httplib2
+import mock
+
+import hyou.client
+import hyou.instrumentation
+
+import http_mocks
+
+
+SHEETS_PREFIX = 'https://sheets.googleapis.com/v4/spreadsheets'
+
+
+class ApiMethodNameTest(unittest.TestCase):
+
+    def test_sheets(self):
+        f = hyou.instrumentation.api_method_name
+        self.assertEqual(
+            'sheets.spreadsheets.create', f('POST', SHEETS_PREFIX))
+        self.assertEqual(
+            'sheets.spreadsheets.get',
+            f('GET', SHEETS_PREFIX + '/key?includeGridData=false'))
+        self.assertEqual(
+            'sheets.spreadsheets.batchUpdate',
+            f('POST', SHEETS_PREFIX + '/key:batchUpdate'))
+        self.assertEqual(
+            'sheets.spreadsheets.values.get',
+            f('GET', SHEETS_PREFIX + '/key/values/%27Sheet1%27%21A1:B2'))
+        self.assertEqual(
+            'sheets.spreadsheets.values.append',
+            f('POST', SHEETS_PREFIX + '/key/values/%27Sheet1%27:append'))
+        self.assertEqual(
+            'sheets.spreadsheets.values.batchGet',
+            f('GET', SHEETS_PREFIX + '/key/values:batchGet?ranges=A1:B2'))
+        self.assertEqual(
+            'sheets.spreadsheets.sheets.copyTo',
+            f('POST', SHEETS_PREFIX + '/key/sheets/0:copyTo'))
+
+    def test_others(self):
+        f = hyou.instrumentation.api_method_name
+        self.assertEqual(
+            'drive.files.list',
+            f('GET', 'https://www.googleapis.com/drive/v2/files?q=x'))
+        self.assertEqual(
+            'drive.files.get',
+            f('GET', 'https://www.googleapis.com/drive/v2/files/key'))
+        self.assertEqual(
+            'discovery',
+            f('GET', 'https://sheets.googleapis.com/$discovery/rest?v=4'))
+        self.assertEqual(
+            'docs.export',
+            f('GET', 'https://docs.google.com/spreadsheets/d/key/export'))
+
+
+class InstrumentedHttpTest(unittest.TestCase):
+
+    def setUp(self):
+        self.real_http = mock.Mock()
+        self.stats = hyou.instrumentation.RequestStats(
+            latency_buckets=(1.0, 10.0))
+        self.http = hyou.instrumentation.InstrumentedHttp(
+            self.real_http, [self.stats])
+
+    def test_stats(self):
+        self.real_http.request.side_effect = [
+            (httplib2.Response({'status': 200}), b'{}'),
+            (httplib2.Response({'status': 503}), b'error'),
+            (httplib2.Response({'status': 200}), b'{"x":1}'),
+            IOError(),
+        ]
+        uri = SHEETS_PREFIX + '/key:batchUpdate'
+        self.http.request(uri, 'POST', body='{"a":1}')
+        self.http.request(uri, 'POST', body='{"b":2}')
+        self.http.request(uri, 'POST', body='{"b":2}')
+        self.assertRaises(IOError, self.http.request, SHEETS_PREFIX + '/key')
+        self.real_http.request.assert_called_with(
+            SHEETS_PREFIX + '/key', 'GET', None)
+
+        stats = self.stats.to_dict()
+        self.assertEqual(
+            ['sheets.spreadsheets.batchUpdate', 'sheets.spreadsheets.get'],
+            sorted(stats))
+        batch_update = stats['sheets.spreadsheets.batchUpdate']
+        self.assertEqual(3, batch_update['count'])
+        self.assertEqual(1, batch_update['errors'])
+        self.assertEqual(1, batch_update['retries'])
+        self.assertEqual(21, batch_update['request_bytes'])
+        self.assertEqual(14, batch_update['response_bytes'])
+        self.assertEqual([1.0, 10.0], list(batch_update['latency_buckets']))
+        self.assertEqual(3, batch_update['latency_buckets'][1.0])
+        self.assertEqual(1, stats['sheets.spreadsheets.get']['errors'])
+
+    def test_to_prometheus(self):
+        self.real_http.request.return_value = (
+            httplib2.Response({'status': 200}), b'{}')
+        self.http.request(SHEETS_PREFIX + '/key')
+        text = self.stats.to_prometheus()
+        self.assertIn(
+            '# TYPE hyou_requests_total counter\n'
+            'hyou_requests_total{method="sheets.spreadsheets.get"} 1\n',
+            text)
+        self.assertIn(
+            'hyou_request_latency_seconds_bucket'
+            '{method="sheets.spreadsheets.get",le="+Inf"} 1\n',
+            text)
+        self.assertIn(
+            'hyou_request_latency_seconds_count'
+            '{method="sheets.spreadsheets.get"} 1\n',
+            text)
+
+    def test_api(self):
+        api = hyou.client.API(
+            http_mocks.ReplayHttp.get_instance(), observers=[self.stats])
+        collection = hyou.client.Collection(api)
+        collection['1OB50n5vs3ZaLKgQ_BHkD7AGkNDMICo3jPXPQ8Y1_ekc']
+        stats = self.stats.to_dict()
+        self.assertEqual(1, stats['sheets.spreadsheets.get']['count'])
+
+
+class RequestTracerTest(unittest.TestCase):
+
+    def test_trace(self):
+        fileobj = io.StringIO()
+        tracer = hyou.instrumentation.RequestTracer(fileobj)
+        api = hyou.client.API(
+            http_mocks.ReplayHttp.get_instance(), observers=[tracer])
+        collection = hyou.client.Collection(api)
+        worksheet = collection[
+            '1OB50n5vs3ZaLKgQ_BHkD7AGkNDMICo3jPXPQ8Y1_ekc']['Sheet1']
+        self.assertEqual('honoka', worksheet[0][0])
+
+        records = [
+            json.loads(line) for line in fileobj.getvalue().splitlines()]
+        self.assertEqual(
+            ['sheets.spreadsheets.get', 'sheets.spreadsheets.values.get'],
+            [record['api_method'] for record in records])
+        record = records[1]
+        self.assertEqual('GET', record['method'])
+        self.assertIsNone(record['body_sha1'])
+        self.assertEqual(200, record['status'])
+        self.assertTrue(record['entry_point'].endswith('__getitem__'))
+        self.assertTrue(any(
+            name.endswith('._ensure_cells_fetched')
+            for name in record['call_stack']))
+        self.assertIn('instrumentation_test.py', record['caller'])
+        self.assertTrue(record['caller'].endswith(':test_trace'))
@@ -21,8 +21,11 @@ from builtins import (  # noqa: F401
 import datetime
 import unittest
 
+import googleapiclient.errors
+
 import hyou.client
 
+import fake_server
 import http_mocks
 
 
@@ -73,6 +76,13 @@ class SpreadsheetTest(unittest.TestCase):
     def test_refresh(self):
         self.spreadsheet.refresh()
 
+    def test_refresh_if_modified(self):
+        self.assertTrue(self.spreadsheet.refresh(if_modified=True))
+        worksheet = self.spreadsheet['Sheet1']
+        # The spreadsheet has not been modified since the last refresh.
+        self.assertFalse(self.spreadsheet.refresh(if_modified=True))
+        self.assertIs(worksheet, self.spreadsheet['Sheet1'])
+
     def test_add_worksheet(self):
         worksheet = self.spreadsheet.add_worksheet('Sheet4', rows=2, cols=8)
         self.assertEqual('Sheet4', worksheet.title)
@@ -100,3 +110,93 @@ class SpreadsheetTest(unittest.TestCase):
                 year=2017, month=2, day=3, hour=1, minute=25, second=31,
                 microsecond=49000),
             self.spreadsheet.updated)
+
+
+class FakeSpreadsheetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = fake_server.FakeServer()
+        self.key = self.server.add_spreadsheet('Cinnamon', [
+            ('Sheet1', 3, 3, [['a', 'b', 'c'], ['d', '', 'f']]),
+            ('Sheet2', 2, 2, [['x'], ['', 'y']]),
+        ])
+        self.collection = hyou.client.Collection(
+            hyou.client.API(self.server))
+        self.spreadsheet = self.collection[self.key]
+        del self.server.requests[:]
+
+    def test_load(self):
+        self.spreadsheet.load()
+        self.assertEqual(
+            [['a', 'b', 'c'], ['d', '', 'f'], ['', '', '']],
+            [list(row) for row in self.spreadsheet['Sheet1']])
+        self.assertEqual(
+            [['x', ''], ['', 'y']],
+            [list(row) for row in self.spreadsheet['Sheet2']])
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_load_ranges(self):
+        self.spreadsheet.load(ranges=['Sheet1!B1:C2', 'Sheet2'])
+        self.assertEqual(1, len(self.server.requests))
+        worksheet = self.spreadsheet['Sheet1']
+        self.assertEqual(
+            [['b', 'c'], ['', 'f']],
+            [list(row) for row in worksheet.view(end_row=2, start_col=1)])
+        self.assertEqual(
+            ['x', ''], list(self.spreadsheet['Sheet2'][0]))
+        self.assertEqual(1, len(self.server.requests))
+        self.assertEqual('a', worksheet[0][0])
+        self.assertEqual(2, len(self.server.requests))
+
+    def test_load_open_ranges(self):
+        self.spreadsheet.load(ranges=['Sheet1!B:C', 'Sheet2!2:2'])
+        self.assertEqual(
+            [['b', 'c'], ['', 'f'], ['', '']],
+            [list(row) for row in self.spreadsheet['Sheet1'].view(
+                start_col=1)])
+        self.assertEqual(
+            ['', 'y'],
+            list(self.spreadsheet['Sheet2'].view(start_row=1)[0]))
+        self.assertEqual(1, len(self.server.requests))
+
+    def test_load_bad_ranges(self):
+        worksheet = self.spreadsheet['Sheet1']
+        self.assertEqual('a', worksheet[0][0])
+        del self.server.requests[:]
+        self.assertRaises(
+            ValueError, self.spreadsheet.load, ranges=['A1:B2'])
+        self.assertRaises(
+            ValueError, self.spreadsheet.load, ranges=['Sheet1!A2:5'])
+        self.assertEqual([], self.server.requests)
+        # The cache is kept.
+        self.assertIs(worksheet, self.spreadsheet['Sheet1'])
+        self.assertEqual('b', worksheet[0][1])
+        self.assertEqual([], self.server.requests)
+
+    def test_load_without_data(self):
+        self.spreadsheet.load(with_data=False)
+        self.assertNotIn('includeGridData=true', self.server.requests[-1][1])
+
+    def test_copy_to_another_spreadsheet(self):
+        dest_key = self.server.add_spreadsheet('Chocolate', [('Sheet1', 3, 3)])
+        dest_spreadsheet = self.collection[dest_key]
+        self.spreadsheet['Sheet2'].copy_to(
+            dest_spreadsheet['Sheet1'].view(start_row=1, start_col=1))
+        self.assertEqual(
+            [[], ['', 'x'], ['', '', 'y']],
+            self.server.get_values(dest_key, 'Sheet1'))
+        dest_spreadsheet.refresh()
+        self.assertEqual(['Sheet1'], dest_spreadsheet.keys())
+
+    def test_copy_to_another_spreadsheet_error(self):
+        dest_key = self.server.add_spreadsheet('Chocolate', [('Sheet1', 3, 3)])
+        dest_spreadsheet = self.collection[dest_key]
+        source = self.spreadsheet['Sheet2']
+        dest = dest_spreadsheet['Sheet1']
+        # Let the worksheet be copied, then fail to paste from it.
+        self.server.queue_errors(None, 503)
+        with self.assertRaises(googleapiclient.errors.HttpError):
+            source.copy_to(dest)
+        self.assertEqual([], self.server.get_values(dest_key, 'Sheet1'))
+        dest_spreadsheet.refresh()
+        self.assertEqual(['Sheet1'], dest_spreadsheet.keys())
@@ -0,0 +1,116 @@
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import unittest
+
+import httplib2
+import mock
+
+import hyou.client
+import hyou.transport
+
+import fake_server
+
+
+class GzipHttpTest(unittest.TestCase):
+
+    def setUp(self):
+        self.real_http = mock.Mock()
+        self.real_http.request.return_value = (
+            httplib2.Response({'status': 200}), b'{}')
+
+    def sent(self):
+        uri, method, body, headers = self.real_http.request.call_args[0]
+        return method, body, headers
+
+    def test_headers(self):
+        http = hyou.transport.GzipHttp(self.real_http)
+        http.request('http://example.com/')
+        _, _, headers = self.sent()
+        self.assertEqual(
+            {'accept-encoding': 'gzip, deflate', 'user-agent': '(gzip)'},
+            headers)
+
+        http.request('http://example.com/', headers={'User-Agent': 'app/1'})
+        _, _, headers = self.sent()
+        self.assertEqual('app/1 (gzip)', headers['User-Agent'])
+        self.assertNotIn('user-agent', headers)
+
+        http.request('http://example.com/', headers={
+            'accept-encoding': 'identity', 'user-agent': 'app/1 (gzip)'})
+        _, _, headers = self.sent()
+        self.assertEqual(
+            {'accept-encoding': 'identity', 'user-agent': 'app/1 (gzip)'},
+            headers)
+
+    def test_compress(self):
+        http = hyou.transport.GzipHttp(
+            self.real_http, compress_threshold=10)
+        http.request('http://example.com/', 'POST', body='{"a": 1}')
+        _, body, headers = self.sent()
+        self.assertEqual('{"a": 1}', body)
+        self.assertNotIn('content-encoding', headers)
+
+        data = '{"values": [["a", "b"], ["a", "b"], ["a", "b"]]}'
+        http.request('http://example.com/', 'POST', body=data)
+        _, body, headers = self.sent()
+        self.assertEqual('gzip', headers['content-encoding'])
+        self.assertEqual(
+            data.encode('utf-8'), hyou.transport.gzip_decompress(body))
+
+        http.request('http://example.com/', 'GET', body=data)
+        _, body, headers = self.sent()
+        self.assertEqual(data, body)
+        self.assertNotIn('content-encoding', headers)
+
+    def test_no_compress_by_default(self):
+        http = hyou.transport.GzipHttp(self.real_http)
+        data = '{"values": [["a", "b"]]}' * 100
+        http.request('http://example.com/', 'POST', body=data)
+        _, body, headers = self.sent()
+        self.assertEqual(data, body)
+        self.assertNotIn('content-encoding', headers)
+
+    def test_api_content_length(self):
+        server = fake_server.FakeServer()
+        key = server.add_spreadsheet('Cinnamon', [('Sheet1', 3, 3)])
+        real_http = mock.Mock(wraps=server)
+        collection = hyou.client.Collection(
+            hyou.client.API(real_http, compress_threshold=0))
+        worksheet = collection[key]['Sheet1']
+        with worksheet:
+            worksheet[0][0] = 'honoka'
+        _, method, body, headers = real_http.request.call_args[0]
+        self.assertEqual('POST', method)
+        self.assertEqual('gzip', headers['content-encoding'])
+        lengths = [
+            value for name, value in headers.items()
+            if name.lower() == 'content-length']
+        self.assertEqual([str(len(body))], lengths)
+
+    def test_api(self):
+        server = fake_server.FakeServer()
+        key = server.add_spreadsheet('Cinnamon', [('Sheet1', 3, 3)])
+        collection = hyou.client.Collection(
+            hyou.client.API(server, compress_threshold=0))
+        worksheet = collection[key]['Sheet1']
+        with worksheet:
+            worksheet[0][0] = 'honoka'
+        self.assertEqual([['honoka']], server.get_values(key, 'Sheet1'))
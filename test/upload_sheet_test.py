@@ -0,0 +1,88 @@
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import hyou.client
+import mock
+
+import fake_server
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tools'))
+import upload_sheet  # noqa: E402
+
+
+class UploadSheetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = fake_server.FakeServer()
+        self.tempdir = tempfile.mkdtemp()
+        flags = upload_sheet.FLAGS
+        flags(['upload_sheet.py'])
+        self.saved_flags = (flags.chunk_bytes, flags.max_cells)
+        patcher = mock.patch('hyou.login', side_effect=self.login)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        flags = upload_sheet.FLAGS
+        flags.chunk_bytes, flags.max_cells = self.saved_flags
+        shutil.rmtree(self.tempdir)
+
+    def login(self, json_path=None):
+        return hyou.client.Collection(hyou.client.API(self.server))
+
+    def upload(self, data):
+        path = os.path.join(self.tempdir, 'data.csv')
+        with open(path, 'w') as f:
+            f.write(data)
+        self.assertIsNone(upload_sheet.upload_main(['upload_sheet.py', path]))
+        spreadsheet_key, = self.server._spreadsheets
+        return spreadsheet_key
+
+    def test_upload(self):
+        upload_sheet.FLAGS.chunk_bytes = 10
+        key = self.upload('a,b\nc,d\ne\n')
+        worksheet = self.login()[key][0]
+        self.assertEqual((3, 2), (worksheet.rows, worksheet.cols))
+        self.assertEqual(
+            [['a', 'b'], ['c', 'd'], ['e']],
+            self.server.get_values(key, worksheet.title))
+
+    def test_quoted_delimiters_near_cell_limit(self):
+        # Each record has 2 columns, but 5 if quoted commas were counted.
+        self.server.max_cells = 20
+        upload_sheet.FLAGS.max_cells = 20
+        upload_sheet.FLAGS.chunk_bytes = 24
+        key = self.upload('"a,b,c,d",x\n' * 8)
+        worksheet = self.login()[key][0]
+        self.assertEqual((8, 2), (worksheet.rows, worksheet.cols))
+        self.assertEqual(
+            [['a,b,c,d', 'x']] * 8,
+            self.server.get_values(key, worksheet.title))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -18,6 +18,7 @@ from builtins import (  # noqa: F401
     ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
     object, oct, open, pow, range, round, str, super, zip)
 
+import io
 import os
 import unittest
 
@@ -48,6 +49,160 @@ class CredentialsTest(unittest.TestCase):
                 ValueError, hyou.util.parse_credentials, f.read())
 
 
+class A1NotationTest(unittest.TestCase):
+
+    def test_format_range_a1_notation(self):
+        self.assertEqual(
+            "'Sheet1'!A1:B2",
+            hyou.util.format_range_a1_notation('Sheet1', 0, 2, 0, 2))
+        self.assertEqual(
+            "'Nico''s'!Z3:AA3",
+            hyou.util.format_range_a1_notation('Nico\'s', 2, 3, 25, 27))
+
+    def test_parse_range_a1_notation(self):
+        self.assertEqual(
+            ('Sheet1', 0, 2, 0, 2),
+            hyou.util.parse_range_a1_notation('Sheet1!A1:B2'))
+        self.assertEqual(
+            ('Nico\'s', 2, 3, 25, 27),
+            hyou.util.parse_range_a1_notation("'Nico''s'!Z3:AA3"))
+        self.assertEqual(
+            (None, 4, 5, 702, 703),
+            hyou.util.parse_range_a1_notation('AAA5'))
+        self.assertRaises(
+            ValueError, hyou.util.parse_range_a1_notation, 'Sheet1!A:B')
+
+    def test_parse_worksheet_range_a1_notation(self):
+        f = hyou.util.parse_worksheet_range_a1_notation
+        self.assertEqual(('Sheet1', (0, 2, 0, 2)), f('Sheet1!A1:B2'))
+        self.assertEqual(('Sheet1', None), f('Sheet1'))
+        self.assertEqual(('ABC', None), f('ABC'))
+        self.assertEqual(('Nico\'s', None), f("'Nico''s'"))
+        self.assertEqual(('Nico\'s', (2, 3, 0, 1)), f("'Nico''s'!A3"))
+        self.assertEqual(('Sheet1', (0, None, 0, 3)), f('Sheet1!A:C'))
+        self.assertEqual(('Sheet1', (1, 5, 0, None)), f('Sheet1!2:5'))
+        self.assertEqual(('Sheet1', (1, None, 0, 3)), f('Sheet1!A2:C'))
+        self.assertRaises(ValueError, f, 'A1:B2')
+        self.assertRaises(ValueError, f, 'A:C')
+        self.assertRaises(ValueError, f, 'Sheet1!A2:5')
+        self.assertRaises(ValueError, f, 'Sheet1!A:C5')
+        self.assertRaises(ValueError, f, 'Sheet1!a1')
+
+
+class MakeExtendedValueTest(unittest.TestCase):
+
+    def test_make_extended_value(self):
+        self.assertEqual(
+            {'numberValue': 28}, hyou.util.make_extended_value(28))
+        self.assertEqual(
+            {'boolValue': True}, hyou.util.make_extended_value(True))
+        self.assertEqual(
+            {'numberValue': -1.5}, hyou.util.make_extended_value('-1.5'))
+        self.assertEqual(
+            {'formulaValue': '=A1+1'},
+            hyou.util.make_extended_value('=A1+1'))
+        self.assertEqual(
+            {'stringValue': 'nan'}, hyou.util.make_extended_value('nan'))
+        self.assertEqual(
+            {'stringValue': ''}, hyou.util.make_extended_value(None))
+        self.assertEqual(
+            {'stringValue': '123'}, hyou.util.make_extended_value("'123"))
+        self.assertEqual(
+            {'stringValue': '=A1'}, hyou.util.make_extended_value("'=A1"))
+        self.assertEqual(
+            {'boolValue': False}, hyou.util.make_extended_value('false'))
+        self.assertEqual(
+            {'stringValue': '10%'}, hyou.util.make_extended_value('10%'))
+
+
+class ReadDelimitedChunksTest(unittest.TestCase):
+
+    def test_chunks(self):
+        text = 'a,b\n"c\n""d"",",e\r\nf\n'
+        self.assertEqual(
+            [('a,b', 1, 2, 4),
+             ('"c\n""d"",",e', 1, 2, 14),
+             ('f', 1, 1, 2)],
+            list(hyou.util.read_delimited_chunks(
+                io.StringIO(text), chunk_bytes=8)))
+        self.assertEqual(
+            [('a,b\n"c\n""d"",",e\r\nf', 3, 2, 20)],
+            list(hyou.util.read_delimited_chunks(
+                io.BytesIO(text.encode('utf-8')))))
+
+    def test_quoted_delimiters(self):
+        self.assertEqual(
+            [('a,"b,c,d"\n"e,f",g,h', 2, 3, 20)],
+            list(hyou.util.read_delimited_chunks(
+                io.StringIO('a,"b,c,d"\n"e,f",g,h\n'))))
+        self.assertEqual(
+            [['a', 'b,c,d'], ['e\nf', 'g']],
+            hyou.util.parse_delimited('a\t"b,c,d"\n"e\nf"\tg', '\t'))
+        self.assertEqual(0, hyou.util.count_delimited_cols(''))
+
+    def test_unterminated(self):
+        self.assertEqual(
+            [('a,"b', 1, 2, 5)],
+            list(hyou.util.read_delimited_chunks(io.StringIO('a,"b\n'))))
+
+
+class RangeTest(unittest.TestCase):
+
+    def test_range_contains(self):
+        self.assertTrue(hyou.util.range_contains((0, 4, 0, 4), (1, 3, 0, 4)))
+        self.assertTrue(hyou.util.range_contains((0, 4, 0, 4), (0, 4, 0, 4)))
+        self.assertFalse(hyou.util.range_contains((0, 4, 0, 4), (1, 5, 0, 4)))
+
+    def test_intersect_range(self):
+        self.assertEqual(
+            (1, 2, 2, 3),
+            hyou.util.intersect_range((0, 2, 0, 3), (1, 4, 2, 5)))
+        self.assertIsNone(
+            hyou.util.intersect_range((0, 2, 0, 3), (2, 4, 0, 3)))
+
+    def test_shift_index(self):
+        self.assertEqual(1, hyou.util.shift_index(1, 2, 3))
+        self.assertEqual(5, hyou.util.shift_index(2, 2, 3))
+        self.assertIsNone(hyou.util.shift_index(4, 2, -3))
+        self.assertEqual(2, hyou.util.shift_index(5, 2, -3))
+
+    def test_shift_range(self):
+        self.assertEqual(
+            (0, 6, 1, 2), hyou.util.shift_range((0, 3, 1, 2), 0, 2, 3))
+        self.assertEqual(
+            (0, 3, 5, 7), hyou.util.shift_range((0, 3, 2, 4), 1, 2, 3))
+        self.assertEqual(
+            (1, 2, 0, 1), hyou.util.shift_range((1, 5, 0, 1), 0, 2, -3))
+        self.assertEqual(
+            (2, 3, 0, 1), hyou.util.shift_range((3, 6, 0, 1), 0, 2, -3))
+        self.assertIsNone(hyou.util.shift_range((2, 5, 0, 1), 0, 2, -3))
+
+    def test_coalesce_cells(self):
+        self.assertEqual(
+            [(0, 0, [['a', 'b'], ['c', 'd']]), (1, 3, [['e']]),
+             (2, 0, [['f']])],
+            hyou.util.coalesce_cells({
+                (0, 0): 'a', (0, 1): 'b', (1, 0): 'c', (1, 1): 'd',
+                (1, 3): 'e', (2, 0): 'f'}))
+
+    def test_subtract_range(self):
+        # Disjoint
+        self.assertEqual(
+            [(0, 2, 0, 2)],
+            hyou.util.subtract_range((0, 2, 0, 2), (2, 4, 0, 2)))
+        # Covered
+        self.assertEqual(
+            [], hyou.util.subtract_range((1, 2, 1, 2), (0, 4, 0, 4)))
+        # Hole in the middle
+        self.assertEqual(
+            [(0, 1, 0, 4), (3, 4, 0, 4), (1, 3, 0, 1), (1, 3, 3, 4)],
+            hyou.util.subtract_range((0, 4, 0, 4), (1, 3, 1, 3)))
+        # Overlapping at a corner
+        self.assertEqual(
+            [(0, 2, 0, 4), (2, 4, 0, 2)],
+            hyou.util.subtract_range((0, 4, 0, 4), (2, 6, 2, 6)))
+
+
 class LazyOrderedDictionaryTest(unittest.TestCase):
 
     def setUp(self):
@@ -140,10 +295,83 @@ class LazyOrderedDictionaryTest(unittest.TestCase):
         self.assertEqual('missing', self.dict.get('B', 'missing'))
 
 
+class EvictingLazyOrderedDictionaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.enumerator = mock.Mock()
+        self.enumerator.return_value = [('A', None), ('B', None), ('C', None)]
+        self.constructor = mock.Mock()
+        self.constructor.side_effect = lambda key: key.lower()
+
+    def test_max_values(self):
+        d = hyou.util.LazyOrderedDictionary(
+            enumerator=self.enumerator, constructor=self.constructor,
+            max_values=2)
+        self.assertEqual('a', d['A'])
+        self.assertEqual('b', d['B'])
+        self.assertEqual('a', d['A'])
+        self.assertEqual(2, self.constructor.call_count)
+        # B is the least recently used value.
+        self.assertEqual('c', d['C'])
+        self.assertEqual('a', d['A'])
+        self.assertEqual(3, self.constructor.call_count)
+        self.assertEqual('b', d['B'])
+        self.assertEqual(4, self.constructor.call_count)
+        # Keys of evicted values are still enumerated.
+        self.assertEqual(['A', 'B', 'C'], d.keys())
+        self.assertEqual(['a', 'b', 'c'], d.values())
+
+    def test_evict_unenumerated_key(self):
+        d = hyou.util.LazyOrderedDictionary(
+            enumerator=self.enumerator, constructor=self.constructor,
+            max_values=1)
+        # X is built before enumeration but is not enumerated.
+        self.assertEqual('x', d['X'])
+        self.assertEqual(4, len(d))
+        self.assertEqual('a', d['A'])
+        self.assertEqual('x', d['X'])
+        self.assertEqual(3, self.constructor.call_count)
+
+    @mock.patch('time.time')
+    def test_ttl(self, time_mock):
+        d = hyou.util.LazyOrderedDictionary(
+            enumerator=self.enumerator, constructor=self.constructor,
+            ttl=60)
+        time_mock.return_value = 1000
+        self.assertEqual('a', d['A'])
+        time_mock.return_value = 1059
+        self.assertEqual('a', d['A'])
+        self.assertEqual(1, self.constructor.call_count)
+        time_mock.return_value = 1060
+        self.assertEqual('a', d['A'])
+        self.assertEqual(2, self.constructor.call_count)
+
+    @mock.patch('time.time')
+    def test_ttl_releases_unread_values(self, time_mock):
+        d = hyou.util.LazyOrderedDictionary(
+            enumerator=self.enumerator, constructor=self.constructor,
+            ttl=60)
+        time_mock.return_value = 1000
+        self.assertEqual('a', d['A'])
+        time_mock.return_value = 1030
+        self.assertEqual('b', d['B'])
+        time_mock.return_value = 1060
+        self.assertEqual('c', d['C'])
+        # A has expired and is released without being read.
+        self.assertEqual(
+            [('A', None), ('B', 'b'), ('C', 'c')], d._cache_list)
+
+    def test_no_constructor(self):
+        self.assertRaises(
+            ValueError, hyou.util.LazyOrderedDictionary,
+            enumerator=self.enumerator, constructor=None, max_values=2)
+
+
 class PseudoList(hyou.util.CustomMutableFixedList):
 
     def __init__(self, real_list):
         self.real_list = real_list
+        self.assigned_indices = []
 
     def __getitem__(self, i):
         return self.real_list[i]
@@ -156,6 +384,7 @@ class PseudoList(hyou.util.CustomMutableFixedList):
 
     def __setitem__(self, i, value):
         self.real_list[i] = value
+        self.assigned_indices.append(i)
 
 
 class CustomMutableFixedListTest(unittest.TestCase):
@@ -228,6 +457,12 @@ class CustomMutableFixedListTest(unittest.TestCase):
         self.assertEqual('banana', self.list[2])
         self.assertEqual('cinamon', self.list[3])
 
+    def test_sort_assigns_changed_only(self):
+        self.list.sort()
+        self.assertEqual([1, 2, 3], self.list.assigned_indices)
+        self.list.sort()
+        self.assertEqual([1, 2, 3], self.list.assigned_indices)
+
     def test_unsupported(self):
         self.assertRaises(NotImplementedError, self.list.__delitem__, 0)
         self.assertRaises(NotImplementedError, self.list.append, 'lemon')
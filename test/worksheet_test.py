@@ -18,13 +18,38 @@ from builtins import (  # noqa: F401
     ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
     object, oct, open, pow, range, round, str, super, zip)
 
+import copy
+import io
 import unittest
 
+import future.utils
+import mock
+
 import hyou.client
 
 import http_mocks
 
 
+SPREADSHEET_ENTRY = {
+    'spreadsheetId': 'key',
+    'properties': {
+        'title': 'Test Sheet',
+    },
+    'sheets': [
+        {
+            'properties': {
+                'sheetId': 0,
+                'title': 'Sheet1',
+                'gridProperties': {
+                    'rowCount': 3,
+                    'columnCount': 3,
+                },
+            },
+        },
+    ],
+}
+
+
 class WorksheetTest(unittest.TestCase):
 
     def setUp(self):
@@ -154,6 +179,33 @@ class WorksheetTest(unittest.TestCase):
 
         self.assertEqual('honoka', self.worksheet[0][0])
 
+    def test_refresh_if_modified(self):
+        self.assertTrue(self.worksheet.refresh(if_modified=True))
+        self.assertEqual('honoka', self.worksheet[0][0])
+        self.assertFalse(self.worksheet.refresh(if_modified=True))
+        self.assertEqual('honoka', self.worksheet[0][0])
+
+        # Uncommitted writes are discarded even if the spreadsheet has not
+        # been modified.
+        self.worksheet[0][0] = 'yukiho'
+        self.assertTrue(self.worksheet.refresh(if_modified=True))
+        self.assertEqual('honoka', self.worksheet[0][0])
+
+    def test_view_shares_cells(self):
+        self.assertEqual('honoka', self.worksheet[0][0])
+        view1 = self.worksheet.view(end_row=1, start_col=2)
+        view2 = self.worksheet.view(start_col=1, end_col=4)
+        http = http_mocks.ReplayHttp.get_instance()
+        with mock.patch.object(http, 'request') as request:
+            # Cells fetched by the worksheet are not fetched again.
+            self.assertEqual('kotori', view1[0][0])
+            self.assertEqual('eri', view2[0][0])
+            # Writes are visible to all views immediately.
+            view1[0][1] = 'sonoda'
+            self.assertEqual('sonoda', view2[0][2])
+            self.assertEqual('sonoda', self.worksheet[0][3])
+            self.assertEqual(0, request.call_count)
+
     def test_set_size(self):
         self.worksheet.set_size(7, 8)
         self.assertEqual(7, self.worksheet.rows)
@@ -233,3 +285,753 @@ class WorksheetTest(unittest.TestCase):
         self.assertRaises(IndexError, lambda: view[0][-4])
         self.assertRaises(IndexError, lambda: view[1][0])
         self.assertRaises(IndexError, lambda: view[-2][0])
+
+
+class CellStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = mock.Mock()
+        self.api.cell_cache = None
+        self.values_api = self.api.sheets.spreadsheets.return_value.values()
+        self.worksheet = mock.Mock()
+        self.worksheet.title = 'Sheet1'
+        self.worksheet._spreadsheet.key = 'key'
+        self.worksheet.rows = 10
+        self.worksheet.cols = 10
+        self.store = hyou.client.CellStore(self.worksheet, self.api)
+
+    def test_iter_range(self):
+        for row, col in [(5, 1), (0, 3), (5, 0), (2, 9), (0, 0)]:
+            self.store.set(row, col, '%d%d' % (row, col))
+        expected = [((0, 0), '00'), ((0, 3), '03'), ((2, 9), '29'),
+                    ((5, 0), '50'), ((5, 1), '51')]
+        # Whichever of the range and the cells is smaller is walked.
+        self.assertEqual(expected, list(self.store.iter_range(0, 10, 0, 10)))
+        self.assertEqual(
+            expected, list(self.store.iter_range(0, 1000, 0, 1000)))
+        self.assertEqual(
+            [((0, 3), '03'), ((5, 1), '51')],
+            list(self.store.iter_range(0, 6, 1, 4)))
+        self.store.invalidate(0, 6, 0, 1)
+        self.assertEqual(
+            [((0, 3), '03'), ((2, 9), '29'), ((5, 1), '51')],
+            list(self.store.iter_range(0, 10, 0, 10)))
+
+    def test_fetch_missing_ranges_only(self):
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['a', 'b'], ['c', 'd']],
+        }
+        self.store.ensure_fetched(0, 2, 0, 2)
+        self.values_api.get.assert_called_once_with(
+            spreadsheetId='key', range="'Sheet1'!A1:B2", majorDimension='ROWS',
+            valueRenderOption='FORMATTED_VALUE',
+            dateTimeRenderOption='FORMATTED_STRING')
+
+        # Fully loaded ranges are not fetched again.
+        self.store.ensure_fetched(1, 2, 1, 2)
+        self.assertEqual(1, self.values_api.get.call_count)
+
+        # Partially loaded ranges are fetched in one batch.
+        self.values_api.batchGet.return_value.execute.return_value = {
+            'valueRanges': [{'values': [['e', 'f', 'g']]}, {}],
+        }
+        self.store.ensure_fetched(0, 3, 0, 3)
+        self.values_api.batchGet.assert_called_once_with(
+            spreadsheetId='key', ranges=["'Sheet1'!A3:C3", "'Sheet1'!C1:C2"],
+            majorDimension='ROWS', valueRenderOption='FORMATTED_VALUE',
+            dateTimeRenderOption='FORMATTED_STRING')
+        self.assertEqual('d', self.store.get(1, 1))
+        self.assertEqual('g', self.store.get(2, 2))
+        self.assertEqual('', self.store.get(0, 2))
+
+    def test_invalidate(self):
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['a', 'b'], ['c', 'd']],
+        }
+        self.store.ensure_fetched(0, 2, 0, 2)
+        self.store.invalidate(1, 2, 0, 2)
+        self.assertEqual('a', self.store.get(0, 0))
+        self.assertEqual('', self.store.get(1, 0))
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['e', 'f']],
+        }
+        self.store.ensure_fetched(0, 2, 0, 2)
+        self.values_api.get.assert_called_with(
+            spreadsheetId='key', range="'Sheet1'!A2:B2", majorDimension='ROWS',
+            valueRenderOption='FORMATTED_VALUE',
+            dateTimeRenderOption='FORMATTED_STRING')
+        self.assertEqual('e', self.store.get(1, 0))
+
+
+class MockedWorksheetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = mock.Mock()
+        self.api.cell_cache = None
+        self.spreadsheets_api = self.api.sheets.spreadsheets.return_value
+        self.values_api = self.spreadsheets_api.values.return_value
+        self.spreadsheet = hyou.client.Spreadsheet(
+            self.api, copy.deepcopy(SPREADSHEET_ENTRY))
+        self.worksheet = self.spreadsheet['Sheet1']
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['a', 'b', 'c'], ['d', 'e', 'f'], ['g', 'h', 'i']],
+        }
+
+    def test_invalidate(self):
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['d', 'e', 'f'], ['g', 'h', 'i']],
+        }
+        view = self.worksheet.view(start_row=1)
+        self.assertEqual('d', view[0][0])
+        view[0][0] = 'x'
+        view[1][0] = 'y'
+        view.invalidate(start_row=1, end_row=2, start_col=0, end_col=1)
+        self.assertEqual([(1, 0, 'x')], view._queued_updates)
+        self.assertEqual('x', view[0][0])
+
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['z']],
+        }
+        self.assertEqual('z', view[1][0])
+        self.values_api.get.assert_called_with(
+            spreadsheetId='key', range="'Sheet1'!A3:A3", majorDimension='ROWS',
+            valueRenderOption='FORMATTED_VALUE',
+            dateTimeRenderOption='FORMATTED_STRING')
+        self.assertEqual('h', view[1][1])
+
+        self.assertRaises(IndexError, view.invalidate, start_row=3)
+        self.assertRaises(IndexError, view.invalidate, end_col=4)
+
+    def test_invalidate_other_views(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        view1 = self.worksheet.view(start_row=1)
+        view2 = self.worksheet.view(start_col=1)
+        self.worksheet[1][1] = 'w'
+        view1[0][2] = 'x'
+        view2[1][0] = 'y'
+        view2[2][0] = 'z'
+        view1.invalidate(end_row=1)
+        self.assertEqual([], self.worksheet._queued_updates)
+        self.assertEqual([], view1._queued_updates)
+        self.assertEqual([(2, 1, 'z')], view2._queued_updates)
+        self.assertEqual('z', self.worksheet[2][1])
+
+    def test_sort_range(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        view = self.worksheet.view(start_row=1, start_col=1)
+        view[0][0] = 'x'
+        view.sort_range([1, 0], ascending=[False, True])
+        self.values_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key', body=mock.ANY)
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key',
+            body={
+                'requests': [{
+                    'sortRange': {
+                        'range': {
+                            'sheetId': 0,
+                            'startRowIndex': 1,
+                            'endRowIndex': 3,
+                            'startColumnIndex': 1,
+                            'endColumnIndex': 3,
+                        },
+                        'sortSpecs': [
+                            {'dimensionIndex': 2, 'sortOrder': 'DESCENDING'},
+                            {'dimensionIndex': 1, 'sortOrder': 'ASCENDING'},
+                        ],
+                    },
+                }],
+            })
+        # Sorted cells are fetched again.
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['h', 'i'], ['x', 'f']],
+        }
+        self.assertEqual('h', view[0][0])
+        self.assertEqual('a', self.worksheet[0][0])
+
+        self.assertRaises(IndexError, view.sort_range, 2)
+        self.assertRaises(ValueError, view.sort_range, 0, [True, False])
+
+    def test_find(self):
+        view = self.worksheet.view(start_row=1, start_col=1)
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['e', 'f'], ['h']],
+        }
+        self.assertEqual([(1, 0)], view.find('h'))
+        self.assertEqual([(1, 1)], view.find(''))
+        self.assertEqual([], view.find('a'))
+        view[0][0] = 'h'
+        self.assertEqual([(0, 0), (1, 0)], view.find('h'))
+        self.assertEqual(1, self.values_api.get.call_count)
+
+    def test_find_replace(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        self.spreadsheets_api.batchUpdate.return_value.execute.return_value = {
+            'replies': [{'findReplace': {'occurrencesChanged': 2}}],
+        }
+        self.assertEqual(
+            2, self.worksheet.find_replace('[ab]', 'z', regex=True))
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key',
+            body={
+                'requests': [{
+                    'findReplace': {
+                        'find': '[ab]',
+                        'replacement': 'z',
+                        'searchByRegex': True,
+                        'matchCase': False,
+                        'matchEntireCell': False,
+                        'includeFormulas': False,
+                        'range': {
+                            'sheetId': 0,
+                            'startRowIndex': 0,
+                            'endRowIndex': 3,
+                            'startColumnIndex': 0,
+                            'endColumnIndex': 3,
+                        },
+                    },
+                }],
+            })
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['z', 'z', 'c']],
+        }
+        self.assertEqual('z', self.worksheet[0][0])
+
+    def test_find_replace_no_occurrences(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        self.spreadsheets_api.batchUpdate.return_value.execute.return_value = {
+            'replies': [{'findReplace': {}}],
+        }
+        self.assertEqual(0, self.worksheet.find_replace('x', 'y'))
+        # The cache is kept.
+        self.worksheet[0][0]
+        self.assertEqual(1, self.values_api.get.call_count)
+
+    def test_copy_to(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        source = self.worksheet.view(end_row=1, end_col=2)
+        dest = self.worksheet.view(start_row=2, end_row=3, start_col=1)
+        source.copy_to(dest, paste_type='PASTE_VALUES')
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key',
+            body={
+                'requests': [{
+                    'copyPaste': {
+                        'source': {
+                            'sheetId': 0,
+                            'startRowIndex': 0,
+                            'endRowIndex': 1,
+                            'startColumnIndex': 0,
+                            'endColumnIndex': 2,
+                        },
+                        'destination': {
+                            'sheetId': 0,
+                            'startRowIndex': 2,
+                            'endRowIndex': 3,
+                            'startColumnIndex': 1,
+                            'endColumnIndex': 3,
+                        },
+                        'pasteType': 'PASTE_VALUES',
+                        'pasteOrientation': 'NORMAL',
+                    },
+                }],
+            })
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['a', 'b']],
+        }
+        self.assertEqual('a', dest[0][0])
+        self.assertEqual('g', self.worksheet[2][0])
+
+    def test_copy_to_another_spreadsheet(self):
+        entry = dict(SPREADSHEET_ENTRY, spreadsheetId='key2')
+        dest = hyou.client.Spreadsheet(self.api, entry)['Sheet1']
+        sheets_api = self.spreadsheets_api.sheets.return_value
+        sheets_api.copyTo.return_value.execute.return_value = {
+            'sheetId': 42,
+            'title': 'Copy of Sheet1',
+        }
+        self.worksheet.copy_to(dest)
+        sheets_api.copyTo.assert_called_once_with(
+            spreadsheetId='key', sheetId=0,
+            body={'destinationSpreadsheetId': 'key2'})
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key2', body=mock.ANY)
+        requests = (
+            self.spreadsheets_api.batchUpdate.call_args[1]['body']['requests'])
+        self.assertEqual(42, requests[0]['copyPaste']['source']['sheetId'])
+        self.assertEqual({'deleteSheet': {'sheetId': 42}}, requests[1])
+
+    def test_copy_to_spreadsheet(self):
+        entry = dict(SPREADSHEET_ENTRY, spreadsheetId='key2')
+        spreadsheet = hyou.client.Spreadsheet(self.api, entry)
+        sheets_api = self.spreadsheets_api.sheets.return_value
+        sheets_api.copyTo.return_value.execute.return_value = {
+            'sheetId': 42,
+            'title': 'Copy of Sheet1',
+            'gridProperties': {'rowCount': 3, 'columnCount': 3},
+        }
+        worksheet = self.worksheet.copy_to_spreadsheet(spreadsheet)
+        self.assertEqual(42, worksheet.key)
+        self.assertEqual(['Sheet1', 'Copy of Sheet1'], spreadsheet.keys())
+        self.assertEqual(1, len(SPREADSHEET_ENTRY['sheets']))
+
+    def test_move_to(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        source = self.worksheet.view(end_row=1)
+        dest = self.worksheet.view(start_row=2, end_row=3, end_col=1)
+        source.move_to(dest)
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key',
+            body={
+                'requests': [{
+                    'cutPaste': {
+                        'source': {
+                            'sheetId': 0,
+                            'startRowIndex': 0,
+                            'endRowIndex': 1,
+                            'startColumnIndex': 0,
+                            'endColumnIndex': 3,
+                        },
+                        'destination': {
+                            'sheetId': 0,
+                            'rowIndex': 2,
+                            'columnIndex': 0,
+                        },
+                        'pasteType': 'PASTE_NORMAL',
+                    },
+                }],
+            })
+        self.values_api.batchGet.return_value.execute.return_value = {
+            'valueRanges': [{}, {}],
+        }
+        self.assertEqual('', self.worksheet[0][0])
+        self.assertEqual('', self.worksheet[2][2])
+        self.assertEqual('d', self.worksheet[1][0])
+
+        entry = dict(SPREADSHEET_ENTRY, spreadsheetId='key2')
+        other = hyou.client.Spreadsheet(self.api, entry)['Sheet1']
+        self.assertRaises(ValueError, source.move_to, other)
+
+    def test_append_rows_shifts_queued_updates(self):
+        view = self.worksheet.view(start_row=1)
+        self.worksheet[0][0] = 'p'
+        view[1][1] = 'q'
+        # Rows are inserted before row 2, e.g. after a table ending at row 1.
+        self.values_api.append.return_value.execute.return_value = {
+            'updates': {'updatedRange': 'Sheet1!A2:C3'},
+        }
+        self.worksheet.append_rows([['x'], ['y']])
+        self.assertEqual([(0, 0, 'p')], self.worksheet._queued_updates)
+        self.assertEqual([(4, 1, 'q')], view._queued_updates)
+
+    def test_append_rows_shifts_cache(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        self.values_api.append.return_value.execute.return_value = {
+            'updates': {'updatedRange': 'Sheet1!A2:C3'},
+        }
+        self.worksheet.append_rows([['x'], ['y']])
+        # Rows after the appended ones are still cached.
+        self.assertEqual('d', self.worksheet[3][0])
+        self.assertEqual('i', self.worksheet[4][2])
+        self.assertEqual(1, self.values_api.get.call_count)
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['x'], ['y']],
+        }
+        self.assertEqual('y', self.worksheet[2][0])
+        self.assertEqual(2, self.values_api.get.call_count)
+
+    def test_append_rows(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        self.values_api.append.return_value.execute.return_value = {
+            'updates': {'updatedRange': 'Sheet1!A3:C4'},
+        }
+        rows = [['x', 1], ['y', None], ['z', 2.5]]
+        self.worksheet.append_rows(iter(rows), batch_rows=2)
+        self.assertEqual(
+            [mock.call(
+                spreadsheetId='key', range="'Sheet1'",
+                valueInputOption='USER_ENTERED',
+                insertDataOption='INSERT_ROWS',
+                includeValuesInResponse=False,
+                body={'majorDimension': 'ROWS',
+                      'values': [['x', '1'], ['y', '']]}),
+             mock.call(
+                spreadsheetId='key', range="'Sheet1'",
+                valueInputOption='USER_ENTERED',
+                insertDataOption='INSERT_ROWS',
+                includeValuesInResponse=False,
+                body={'majorDimension': 'ROWS',
+                      'values': [['z', '2.50000000000000000000e+00']]})],
+            self.values_api.append.call_args_list)
+        self.assertEqual(6, self.worksheet.rows)
+        self.assertEqual(6, len(self.worksheet))
+        # Rows before the appended ones are still cached.
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['x', '1']],
+        }
+        self.assertEqual('e', self.worksheet[1][1])
+        self.assertEqual('x', self.worksheet[2][0])
+
+    @mock.patch('time.time')
+    def test_appender(self, time_mock):
+        self.values_api.append.return_value.execute.return_value = {
+            'updates': {'updatedRange': 'Sheet1!A4:C4'},
+        }
+        time_mock.return_value = 1000
+        with self.worksheet.appender(
+                batch_rows=None, batch_bytes=20, flush_interval=60) as a:
+            a.append(['a'])
+            self.assertEqual(0, self.values_api.append.call_count)
+            # Flushed by size.
+            a.append(['0123456789'])
+            self.assertEqual(1, self.values_api.append.call_count)
+            # Flushed by time.
+            a.append(['b'])
+            time_mock.return_value = 1060
+            a.append(['c'])
+            self.assertEqual(2, self.values_api.append.call_count)
+            a.append(['d'])
+        self.assertEqual(3, self.values_api.append.call_count)
+
+    def test_write_rows(self):
+        view = self.worksheet.view(start_row=1, start_col=1)
+        view.write_rows([['x', 1], ['y']])
+        self.values_api.update.assert_called_once_with(
+            spreadsheetId='key', range="'Sheet1'!B2:C3",
+            valueInputOption='USER_ENTERED', includeValuesInResponse=False,
+            body={'majorDimension': 'ROWS', 'values': [['x', '1'], ['y']]})
+        self.assertEqual('x', self.worksheet[1][1])
+        self.assertEqual('1', self.worksheet[1][2])
+        self.assertRaises(ValueError, view.write_rows, [['x', 'y', 'z']])
+        self.assertRaises(ValueError, view.write_rows, [[]] * 3)
+
+    def test_load_delimited(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        fileobj = io.StringIO('x,y\n"p\nq",r\ns,t,u,v\n')
+        self.assertEqual(
+            3,
+            self.worksheet.load_delimited(fileobj, chunk_bytes=8, start_row=1))
+        batch_update = self.spreadsheets_api.batchUpdate
+        self.assertEqual(3, batch_update.call_count)
+        self.assertEqual(
+            [{
+                'pasteData': {
+                    'coordinate': {
+                        'sheetId': 0, 'rowIndex': 1, 'columnIndex': 0,
+                    },
+                    'data': 'x,y',
+                    'type': 'PASTE_NORMAL',
+                    'delimiter': ',',
+                },
+            }],
+            batch_update.call_args_list[0][1]['body']['requests'])
+        self.assertEqual(
+            '"p\nq",r',
+            batch_update.call_args_list[1][1]['body']['requests'][0]
+            ['pasteData']['data'])
+        self.assertEqual(
+            [{'appendDimension': {
+                'sheetId': 0, 'dimension': 'ROWS', 'length': 1}},
+             {'appendDimension': {
+                 'sheetId': 0, 'dimension': 'COLUMNS', 'length': 1}}],
+            batch_update.call_args_list[2][1]['body']['requests'][:2])
+        self.assertEqual(4, self.worksheet.rows)
+        self.assertEqual(4, self.worksheet.cols)
+        self.assertEqual(4, len(self.worksheet[0]))
+        # Pasted rows are fetched again.
+        self.assertEqual('a', self.worksheet[0][0])
+        self.values_api.batchGet.return_value.execute.return_value = {
+            'valueRanges': [{'values': [['x', 'y']]}, {}],
+        }
+        self.assertEqual('x', self.worksheet[1][0])
+
+    def test_load_delimited_quoted_delimiters(self):
+        fileobj = io.StringIO('x,"y,z,w,v"\n')
+        self.assertEqual(
+            1, self.worksheet.load_delimited(fileobj, start_row=1))
+        self.assertEqual(
+            ['pasteData'],
+            [list(request)[0] for request in
+             self.spreadsheets_api.batchUpdate.call_args[1]['body']
+             ['requests']])
+        self.assertEqual(3, self.worksheet.cols)
+
+    def test_paste_delimited(self):
+        self.worksheet.paste_delimited(
+            'x\ty\nz', start_row=1, start_col=1, delimiter='\t')
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key',
+            body={
+                'requests': [{
+                    'pasteData': {
+                        'coordinate': {
+                            'sheetId': 0, 'rowIndex': 1, 'columnIndex': 1,
+                        },
+                        'data': 'x\ty\nz',
+                        'type': 'PASTE_NORMAL',
+                        'delimiter': '\t',
+                    },
+                }],
+            })
+
+    def test_paste_delimited_grows(self):
+        self.worksheet.paste_delimited('p,"q,r"\ns', start_row=2, start_col=2)
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key', body=mock.ANY)
+        self.assertEqual(
+            [{'appendDimension': {
+                'sheetId': 0, 'dimension': 'ROWS', 'length': 1}},
+             {'appendDimension': {
+                 'sheetId': 0, 'dimension': 'COLUMNS', 'length': 1}}],
+            self.spreadsheets_api.batchUpdate.call_args[1]['body']
+            ['requests'][:2])
+        self.assertEqual(4, self.worksheet.rows)
+        self.assertEqual(4, self.worksheet.cols)
+
+    def test_auto_resize_view(self):
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['g', 'h', 'i']],
+        }
+        view = self.worksheet.view(start_row=2, end_row=5, auto_resize=True)
+        self.assertEqual((3, 3), (view.rows, view.cols))
+        # Cells beyond the grid are not fetched.
+        self.assertEqual('g', view[0][0])
+        self.assertEqual('', view[2][0])
+        self.values_api.get.assert_called_once_with(
+            spreadsheetId='key', range="'Sheet1'!A3:C3",
+            majorDimension='ROWS', valueRenderOption='FORMATTED_VALUE',
+            dateTimeRenderOption='FORMATTED_STRING')
+
+        view[0][0] = 'x'
+        view[2][0] = 1
+        view[2][1] = '=A1'
+        view[2][2] = ''
+        view.commit()
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key',
+            body={
+                'requests': [
+                    {
+                        'appendDimension': {
+                            'sheetId': 0, 'dimension': 'ROWS', 'length': 2,
+                        },
+                    },
+                    {
+                        'updateCells': {
+                            'start': {
+                                'sheetId': 0, 'rowIndex': 2, 'columnIndex': 0,
+                            },
+                            'rows': [{
+                                'values': [
+                                    {'userEnteredValue': {'stringValue': 'x'}},
+                                ],
+                            }],
+                            'fields': 'userEnteredValue',
+                        },
+                    },
+                    {
+                        'updateCells': {
+                            'start': {
+                                'sheetId': 0, 'rowIndex': 4, 'columnIndex': 0,
+                            },
+                            'rows': [{
+                                'values': [
+                                    {'userEnteredValue': {'numberValue': 1}},
+                                    {'userEnteredValue':
+                                     {'formulaValue': '=A1'}},
+                                    {},
+                                ],
+                            }],
+                            'fields': 'userEnteredValue',
+                        },
+                    },
+                ],
+            })
+        self.values_api.batchUpdate.assert_not_called()
+        self.assertEqual([], view._queued_updates)
+        # The worksheet grows without refetching.
+        self.assertEqual(5, self.worksheet.rows)
+        self.assertEqual(5, len(self.worksheet))
+        self.assertEqual('1', self.worksheet[4][0])
+        self.assertEqual('', self.worksheet.view(start_row=2)[1][2])
+        self.spreadsheets_api.get.assert_not_called()
+        self.assertEqual(1, self.values_api.get.call_count)
+
+    def test_insert_rows(self):
+        self.assertEqual('d', self.worksheet[1][0])
+        view = self.worksheet.view(start_row=2)
+        view[0][1] = 'x'
+        self.worksheet.insert_rows(1, 2)
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key',
+            body={
+                'requests': [{
+                    'insertDimension': {
+                        'range': {
+                            'sheetId': 0, 'dimension': 'ROWS',
+                            'startIndex': 1, 'endIndex': 3,
+                        },
+                    },
+                }],
+            })
+        self.assertEqual(5, self.worksheet.rows)
+        self.assertEqual(
+            [['a', 'b', 'c'], ['', '', ''], ['', '', ''], ['d', 'e', 'f'],
+             ['g', 'x', 'i']],
+            [list(row) for row in self.worksheet])
+        self.assertEqual([(4, 1, 'x')], view._queued_updates)
+        self.assertEqual(1, self.values_api.get.call_count)
+
+    def test_delete_cols(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        self.worksheet[0][2] = 'x'
+        self.worksheet[1][1] = 'y'
+        self.worksheet.delete_cols(0, 2)
+        self.spreadsheets_api.batchUpdate.assert_called_once_with(
+            spreadsheetId='key',
+            body={
+                'requests': [{
+                    'deleteDimension': {
+                        'range': {
+                            'sheetId': 0, 'dimension': 'COLUMNS',
+                            'startIndex': 0, 'endIndex': 2,
+                        },
+                    },
+                }],
+            })
+        self.assertEqual(1, self.worksheet.cols)
+        self.assertEqual(
+            [['x'], ['f'], ['i']], [list(row) for row in self.worksheet])
+        self.assertEqual([(0, 0, 'x')], self.worksheet._queued_updates)
+        self.assertEqual(1, self.values_api.get.call_count)
+
+    def test_insert_delete_out_of_range(self):
+        self.assertRaises(IndexError, self.worksheet.insert_rows, 4)
+        self.assertRaises(IndexError, self.worksheet.delete_cols, 2, 2)
+        self.assertRaises(ValueError, self.worksheet.delete_rows, 0, 0)
+        self.spreadsheets_api.batchUpdate.assert_not_called()
+
+    def test_clear(self):
+        self.worksheet[0][0] = 'x'
+        self.worksheet[2][2] = 'y'
+        view = self.worksheet.view(end_row=2)
+        view.clear()
+        self.values_api.clear.assert_called_once_with(
+            spreadsheetId='key', range="'Sheet1'!A1:C2", body={})
+        self.assertEqual([(2, 2, 'y')], self.worksheet._queued_updates)
+        # Cleared cells are not fetched.
+        self.assertEqual([['', '', ''], ['', '', '']], [list(r) for r in view])
+        self.values_api.get.assert_not_called()
+
+    def test_clear_ranges(self):
+        views = [
+            self.worksheet.view(end_row=1),
+            self.worksheet.view(start_row=2, end_row=4, auto_resize=True),
+        ]
+        self.spreadsheet.clear_ranges(views)
+        self.values_api.batchClear.assert_called_once_with(
+            spreadsheetId='key',
+            body={'ranges': ["'Sheet1'!A1:C1", "'Sheet1'!A3:C3"]})
+        self.assertEqual('', views[1][1][0])
+        self.values_api.get.assert_not_called()
+
+    def test_formulas(self):
+        self.assertEqual('a', self.worksheet[0][0])
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['=B2', 3], ['=SUM(B2:B3)', True]],
+        }
+        view = self.worksheet.view(start_row=1, start_col=1)
+        self.assertEqual('=B2', view[0].formula(0))
+        self.values_api.get.assert_called_with(
+            spreadsheetId='key', range="'Sheet1'!B2:C3", majorDimension='ROWS',
+            valueRenderOption='FORMULA',
+            dateTimeRenderOption='FORMATTED_STRING')
+        self.assertEqual([['=B2', 3], ['=SUM(B2:B3)', True]], view.formulas())
+        self.assertEqual(2, self.values_api.get.call_count)
+        # Formatted values are cached separately.
+        self.assertEqual('e', view[0][0])
+
+        view[0][1] = '=B2*2'
+        self.assertEqual('=B2*2', view[0].formula(1))
+        self.worksheet.insert_rows(0)
+        self.assertEqual('=B2', self.worksheet[2].formula(1))
+        self.assertEqual('=B2*2', self.worksheet[2].formula(2))
+        view.invalidate()
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['=B3']],
+        }
+        self.assertEqual('=B3', view[0].formula(0))
+        self.assertEqual(3, self.values_api.get.call_count)
+
+    def test_iter_nonempty(self):
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['', 'b'], [], ['', '', 'i']],
+        }
+        self.assertEqual(
+            [(0, 1, 'b'), (2, 2, 'i')], list(self.worksheet.iter_nonempty()))
+        self.assertEqual((0, 3, 1, 3), self.worksheet.used_range())
+        view = self.worksheet.view(start_row=1, start_col=1)
+        self.assertEqual([(1, 1, 'i')], list(view.iter_nonempty()))
+        self.assertEqual((1, 2, 1, 2), view.used_range())
+        self.assertIsNone(
+            self.worksheet.view(end_row=2, end_col=1).used_range())
+        self.values_api.get.assert_called_once_with(
+            spreadsheetId='key', range="'Sheet1'!A1:C3", majorDimension='ROWS',
+            valueRenderOption='FORMATTED_VALUE',
+            dateTimeRenderOption='FORMATTED_STRING')
+
+    def test_view_clip(self):
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['a'], ['', 'e']],
+        }
+        view = self.worksheet.view(clip=True)
+        self.assertEqual((2, 2), (view.rows, view.cols))
+        self.assertEqual([['a', ''], ['', 'e']], [list(row) for row in view])
+        self.assertEqual(1, self.values_api.get.call_count)
+        view = self.worksheet.view(start_row=2, clip=True)
+        self.assertEqual((0, 0), (view.rows, view.cols))
+        self.assertRaises(
+            ValueError, self.worksheet.view, auto_resize=True, clip=True)
+
+    def test_export_csv(self):
+        self.values_api.get.return_value.execute.side_effect = [
+            {'values': [['a', 'b,c'], []]},
+            {'values': [['d']]},
+        ]
+        fileobj = io.BytesIO() if future.utils.PY2 else io.StringIO()
+        self.worksheet.export_csv(fileobj, page_rows=2)
+        self.assertEqual('a,"b,c"\r\n\r\nd\r\n', fileobj.getvalue())
+        self.assertEqual(
+            [mock.call(
+                spreadsheetId='key', range="'Sheet1'!A1:C2",
+                majorDimension='ROWS', valueRenderOption='FORMATTED_VALUE',
+                dateTimeRenderOption='FORMATTED_STRING'),
+             mock.call(
+                spreadsheetId='key', range="'Sheet1'!A3:C3",
+                majorDimension='ROWS', valueRenderOption='FORMATTED_VALUE',
+                dateTimeRenderOption='FORMATTED_STRING')],
+            self.values_api.get.call_args_list)
+        # Exported cells are not cached.
+        self.values_api.get.return_value.execute.side_effect = None
+        self.assertEqual('a', self.worksheet[0][0])
+
+    def test_export_csv_trailing_empty_rows(self):
+        self.values_api.get.return_value.execute.return_value = {
+            'values': [['a'], [], []],
+        }
+        fileobj = io.BytesIO() if future.utils.PY2 else io.StringIO()
+        self.worksheet.export_csv(fileobj, delimiter='\t')
+        self.assertEqual('a\r\n', fileobj.getvalue())
+
+    def test_export_csv_use_drive(self):
+        self.api.http.request.return_value = (
+            mock.Mock(status=200), b'a,b\r\n')
+        fileobj = io.BytesIO() if future.utils.PY2 else io.StringIO()
+        self.worksheet.export_csv(fileobj, use_drive=True)
+        self.assertEqual('a,b\r\n', fileobj.getvalue())
+        self.api.http.request.assert_called_once_with(
+            'https://docs.google.com/spreadsheets/d/key/export?'
+            'format=csv&gid=0')
+        self.assertRaises(
+            ValueError, self.worksheet.export_csv, fileobj, delimiter='\t',
+            use_drive=True)
@@ -0,0 +1,122 @@
+#!/usr/bin/python
+#
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Summarizes a request trace written by hyou.instrumentation.RequestTracer.
+
+Usage:
+analyze_trace.py [--top=N] <trace file>...
+
+Prints requests per API method, hot call sites, and redundant fetches,
+i.e. reads identical to an earlier read of the same spreadsheet with no
+write to it in between.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import collections
+import json
+import re
+import sys
+
+import gflags
+
+FLAGS = gflags.FLAGS
+
+gflags.DEFINE_integer('top', 10, 'Number of entries shown in each section.')
+
+DOCUMENT_KEY_RE = re.compile(r'/(?:spreadsheets|files|d)/([^/:?]+)')
+
+
+class Summary(object):
+
+    def __init__(self):
+        self.count = 0
+        self.latency = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+
+    def add(self, record):
+        self.count += 1
+        self.latency += record['latency']
+        self.request_bytes += record['request_bytes']
+        self.response_bytes += record['response_bytes']
+
+    def format(self):
+        return '%6d calls %9.3fs %10d bytes sent %10d bytes received' % (
+            self.count, self.latency, self.request_bytes,
+            self.response_bytes)
+
+
+def load_records(paths):
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def get_document_key(uri):
+    m = DOCUMENT_KEY_RE.search(uri)
+    return m.group(1) if m else None
+
+
+def print_section(title, summaries):
+    print(title)
+    print('=' * len(title))
+    ranked = sorted(
+        summaries.items(),
+        key=lambda item: (-item[1].latency, -item[1].count, item[0]))
+    for name, summary in ranked[:FLAGS.top]:
+        print(summary.format(), name)
+    print()
+
+
+def main(argv):
+    if len(argv) < 2:
+        return __doc__
+
+    by_method = collections.defaultdict(Summary)
+    by_call_site = collections.defaultdict(Summary)
+    redundant = collections.defaultdict(Summary)
+    # Reads seen since the last write, per document.
+    reads = collections.defaultdict(set)
+    for record in load_records(argv[1:]):
+        by_method[record['api_method']].add(record)
+        call_site = '%s <- %s' % (record['entry_point'], record['caller'])
+        by_call_site[call_site].add(record)
+
+        key = get_document_key(record['uri'])
+        if record['method'] != 'GET':
+            reads.pop(key, None)
+            continue
+        signature = (record['uri'], record['body_sha1'])
+        if signature in reads[key]:
+            redundant['%s %s (%s)' % (
+                record['api_method'], record['uri'], call_site)].add(record)
+        else:
+            reads[key].add(signature)
+
+    print_section('Requests per API method', by_method)
+    print_section('Hot call sites', by_call_site)
+    print_section('Redundant fetches', redundant)
+
+
+if __name__ == '__main__':
+    sys.exit(main(FLAGS(sys.argv)))
@@ -0,0 +1,116 @@
+#!/usr/bin/python
+#
+# Copyright 2017 Google Inc. All rights reserved
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#      http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Downloads worksheets of a Google Spreadsheet as CSV files.
+
+Usage:
+download_sheet.py [--output_dir=DIR] [--parallel=N] [--drive_export]
+                  <spreadsheet key> [<worksheet title>...]
+
+Each worksheet is saved as <worksheet title>.csv. All worksheets are
+downloaded if no title is given. Run upload_sheet.py --authenticate first
+to save your credentials.
+"""
+
+from __future__ import (
+    absolute_import, division, print_function, unicode_literals)
+from builtins import (  # noqa: F401
+    ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
+    object, oct, open, pow, range, round, str, super, zip)
+
+import io
+import os
+import sys
+import threading
+
+import future.utils
+from future.moves import queue
+import gflags
+import hyou
+
+CREDENTIAL_PATH = os.path.join(os.environ['HOME'], '.hyou.credential.json')
+
+FLAGS = gflags.FLAGS
+
+gflags.DEFINE_string('output_dir', '.', 'Directory to save CSV files.')
+gflags.DEFINE_integer(
+    'parallel', 1, 'Number of worksheets downloaded at once.')
+gflags.DEFINE_integer('page_rows', 1000, 'Number of rows fetched per request.')
+gflags.DEFINE_bool(
+    'drive_export', False,
+    'Download CSV files exported by Google Drive. Faster, but each file is '
+    'held in memory.')
+
+
+def open_output(path):
+    if future.utils.PY2:
+        return io.open(path, 'wb')
+    return io.open(path, 'w', encoding='utf-8', newline='')
+
+
+def download_worksheet(worksheet):
+    filename = '%s.csv' % worksheet.title.replace('/', '_')
+    path = os.path.join(FLAGS.output_dir, filename)
+    with open_output(path) as f:
+        worksheet.export_csv(
+            f, page_rows=FLAGS.page_rows, use_drive=FLAGS.drive_export)
+    return path
+
+
+def worker_main(key, titles, errors):
+    # httplib2.Http is not thread-safe, so each worker logs in by itself.
+    try:
+        spreadsheet = hyou.login(json_path=CREDENTIAL_PATH)[key]
+        while True:
+            try:
+                title = titles.get_nowait()
+            except queue.Empty:
+                return
+            print(download_worksheet(spreadsheet[title]), file=sys.stderr)
+    except Exception as e:
+        errors.append(e)
+
+
+def main(argv):
+    if len(argv) < 2:
+        return __doc__
+
+    key = argv[1]
+    try:
+        spreadsheet = hyou.login(json_path=CREDENTIAL_PATH)[key]
+    except Exception:
+        return ('Your credential is missing, expired or invalid.'
+                'Please authenticate again by upload_sheet.py '
+                '--authenticate.')
+
+    titles = queue.Queue()
+    for title in argv[2:] or spreadsheet.keys():
+        titles.put(title)
+
+    errors = []
+    threads = [
+        threading.Thread(target=worker_main, args=(key, titles, errors))
+        for _ in range(FLAGS.parallel)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+
+
+if __name__ == '__main__':
+    sys.exit(main(FLAGS(sys.argv)))
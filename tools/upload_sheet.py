@@ -18,7 +18,15 @@
 
 Usage:
 upload_sheet.py --authenticate
-upload_sheet.py <filename>
+upload_sheet.py [--chunk_bytes=N] [--parallel=N] [--resume] <filename>
+
+The file is split into chunks at record boundaries without being parsed,
+and each chunk is pasted with one request, so files larger than the memory
+can be uploaded. If an upload fails, run the same command with --resume to
+upload the remaining chunks to the same spreadsheet.
+
+The sheet grows geometrically while uploading, up to --max_cells cells,
+and is trimmed to the size of the data at the end.
 """
 
 from __future__ import (
@@ -27,12 +35,16 @@ from builtins import (  # noqa: F401
     ascii, bytes, chr, dict, filter, hex, input, int, list, map, next,
     object, oct, open, pow, range, round, str, super, zip)
 
-import csv
+import io
+import json
 import os
 import sys
+import threading
 
+from future.moves import queue
 import gflags
 import hyou
+import hyou.util
 import oauth2client.client
 
 CREDENTIAL_PATH = os.path.join(os.environ['HOME'], '.hyou.credential.json')
@@ -46,14 +58,115 @@ FLAGS = gflags.FLAGS
 gflags.DEFINE_bool('authenticate', False, '')
 gflags.DEFINE_string('client_id', TEST_CLIENT_ID, '')
 gflags.DEFINE_string('client_secret', TEST_CLIENT_SECRET, '')
+gflags.DEFINE_integer(
+    'chunk_bytes', 1024 * 1024, 'Size of text sent per request.')
+gflags.DEFINE_integer('parallel', 1, 'Number of concurrent requests.')
+gflags.DEFINE_bool('resume', False, 'Resume a failed upload.')
+gflags.DEFINE_integer(
+    'max_cells', 10000000, 'Maximum number of cells in a spreadsheet.')
 gflags.MarkFlagAsRequired('client_id')
 gflags.MarkFlagAsRequired('client_secret')
 
 
-def load_sheet(path):
-    with open(path, 'rb') as f:
-        reader = csv.reader(f)
-        return list(reader)
+def get_delimiter(path):
+    return '\t' if path.lower().endswith('.tsv') else ','
+
+
+class UploadState(object):
+    """Records uploaded chunks to resume a failed upload."""
+
+    def __init__(self, path):
+        self._path = path
+        self._lock = threading.Lock()
+        self.key = None
+        self.chunk_bytes = None
+        self.done_chunks = set()
+
+    def load(self):
+        with open(self._path, 'r') as f:
+            data = json.load(f)
+        self.key = data['key']
+        self.chunk_bytes = data['chunk_bytes']
+        self.done_chunks = set(data['done_chunks'])
+
+    def mark_done(self, index):
+        with self._lock:
+            self.done_chunks.add(index)
+            self.save()
+
+    def save(self):
+        data = {
+            'key': self.key,
+            'chunk_bytes': self.chunk_bytes,
+            'done_chunks': sorted(self.done_chunks),
+        }
+        with open(self._path + '.tmp', 'w') as f:
+            f.write(str(json.dumps(data)))
+        os.rename(self._path + '.tmp', self._path)
+
+    def remove(self):
+        os.remove(self._path)
+
+
+class Uploader(object):
+    """Uploads chunks of rows to a worksheet with worker threads."""
+
+    def __init__(self, key, delimiter, state, parallel):
+        self._key = key
+        self._delimiter = delimiter
+        self._state = state
+        self._queue = queue.Queue(maxsize=parallel * 2)
+        self._errors = []
+        self._uploaded_rows = 0
+        self._lock = threading.Lock()
+        self._threads = [
+            threading.Thread(target=self._worker_main)
+            for _ in range(parallel)]
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def submit(self, index, start_row, num_records, num_cols, text):
+        if self._errors:
+            raise self._errors[0]
+        self._queue.put((index, start_row, num_records, num_cols, text))
+
+    def finish(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def _worker_main(self):
+        # httplib2.Http is not thread-safe, so each worker logs in by itself.
+        try:
+            worksheet = hyou.login(json_path=CREDENTIAL_PATH)[self._key][0]
+        except Exception as e:
+            self._errors.append(e)
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            if self._errors:
+                continue
+            index, start_row, num_records, num_cols, text = item
+            try:
+                if (start_row + num_records > worksheet.rows or
+                        num_cols > worksheet.cols):
+                    # The main thread has grown the sheet.
+                    worksheet.refresh()
+                worksheet.paste_delimited(
+                    text, start_row=start_row, delimiter=self._delimiter)
+            except Exception as e:
+                self._errors.append(e)
+                continue
+            self._state.mark_done(index)
+            with self._lock:
+                self._uploaded_rows += num_records
+                print('Uploaded %d rows' % self._uploaded_rows,
+                      file=sys.stderr)
 
 
 def upload_main(argv):
@@ -61,8 +174,7 @@ def upload_main(argv):
         return __doc__
 
     path = argv[1]
-
-    sheet = load_sheet(path)
+    state = UploadState(path + '.upload-state.json')
 
     try:
         collection = hyou.login(json_path=CREDENTIAL_PATH)
@@ -70,14 +182,48 @@ def upload_main(argv):
         return ('Your credential is missing, expired or invalid.'
                 'Please authenticate again by --authenticate.')
 
-    title = os.path.basename(path).decode('utf-8')
-    spreadsheet = collection.create_spreadsheet(
-        title, rows=len(sheet), cols=len(sheet[0]))
+    if FLAGS.resume:
+        state.load()
+        if state.chunk_bytes != FLAGS.chunk_bytes:
+            return ('--chunk_bytes must be %d to resume the upload.' %
+                    state.chunk_bytes)
+        spreadsheet = collection[state.key]
+    else:
+        title = os.path.basename(path)
+        if isinstance(title, bytes):
+            title = title.decode('utf-8')
+        spreadsheet = collection.create_spreadsheet(title, rows=1, cols=1)
+        state.key = spreadsheet.key
+        state.chunk_bytes = FLAGS.chunk_bytes
+        state.save()
+    worksheet = spreadsheet[0]
+
+    delimiter = get_delimiter(path)
+    uploader = Uploader(spreadsheet.key, delimiter, state, FLAGS.parallel)
+    total_rows = 0
+    total_cols = 1
+    with io.open(path, 'rb') as f:
+        chunks = hyou.util.read_delimited_chunks(
+            f, delimiter=delimiter, chunk_bytes=FLAGS.chunk_bytes)
+        for index, (text, num_records, num_cols, _) in enumerate(chunks):
+            start_row = total_rows
+            total_rows += num_records
+            total_cols = max(total_cols, num_cols)
+            if index in state.done_chunks:
+                continue
+            if total_rows > worksheet.rows or num_cols > worksheet.cols:
+                # Grow the sheet geometrically to save round trips, but not
+                # beyond the cell limit.
+                cols = max(num_cols, worksheet.cols)
+                worksheet.set_size(
+                    max(total_rows,
+                        min(worksheet.rows * 2, FLAGS.max_cells // cols)),
+                    cols)
+            uploader.submit(index, start_row, num_records, num_cols, text)
+    uploader.finish()
 
-    with spreadsheet[0] as worksheet:
-        for srow, trow in zip(sheet, worksheet):
-            for i, value in enumerate(srow):
-                trow[i] = value.decode('utf-8')
+    worksheet.set_size(max(total_rows, 1), total_cols)
+    state.remove()
 
     print(spreadsheet.url)
 